@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import BATCH_SIZES, ROW_WIDTHS, make_columns, make_rows
+
+
+@pytest.mark.benchmark(group="client_get_list")
+@pytest.mark.parametrize("width", ROW_WIDTHS)
+@pytest.mark.parametrize("size", BATCH_SIZES)
+def bench_get_list(benchmark, loop, fake, ch_client, width, size):
+    fake.add_response(r"FROM bench\.bench_table", make_columns(width), make_rows(width, size))
+
+    def run():
+        # decode all cells, like services which use every field of record
+        rows = loop.run_until_complete(ch_client.get_list("bench_table"))
+        return [row[:] for row in rows]
+
+    benchmark(run)
+
+
+@pytest.mark.benchmark(group="client_get_object")
+def bench_get_object(benchmark, loop, fake, ch_client):
+    fake.add_response(r"FROM bench\.bench_table", make_columns(30), make_rows(30, 1))
+
+    benchmark(lambda: loop.run_until_complete(ch_client.get_object("bench_table", {"id": 1})))
+
+
+@pytest.mark.benchmark(group="client_get_count")
+def bench_get_count(benchmark, loop, ch_client):
+    count = benchmark(lambda: loop.run_until_complete(ch_client.get_count(table="bench_table")))
+
+    assert count == 100, "count must be answered by count response"
+
+
+@pytest.mark.benchmark(group="client_raw")
+def bench_raw_fetchval(benchmark, loop, ch_client):
+    count = benchmark(
+        lambda: loop.run_until_complete(ch_client.raw("SELECT count() FROM bench_table", "fetchval"))
+    )
+
+    assert count == 100, "count must be answered by count response"
+
+
+@pytest.mark.benchmark(group="client_create")
+@pytest.mark.parametrize("width", ROW_WIDTHS)
+@pytest.mark.parametrize("size", BATCH_SIZES)
+def bench_create(benchmark, loop, ch_client, width, size):
+    values = make_rows(width, size)
+
+    benchmark(lambda: loop.run_until_complete(ch_client.create("bench_table", values)))
+
+
+@pytest.mark.benchmark(group="client_get_list_partial_read")
+@pytest.mark.parametrize("lazy", [False, True])
+def bench_get_list_partial_read(benchmark, loop, fake, ch_client, lazy):
+    fake.add_response(r"FROM bench\.bench_table", make_columns(30), make_rows(30, 10000))
+
+    def run():
+        # listing endpoints read only few of selected fields
+        rows = loop.run_until_complete(ch_client.get_list("bench_table", lazy=lazy))
+        return [(row["c0"], row["c1"]) for row in rows]
+
+    benchmark(run)
@@ -0,0 +1,52 @@
+import pytest
+
+from clickhouse_utils.sql.mapper import BaseType, rows2ch, what_py_type
+
+from conftest import (
+    BATCH_SIZES,
+    ESCAPE_DENSITIES,
+    NESTED_TYPES,
+    ROW_WIDTHS,
+    make_rows,
+    random_string,
+)
+
+
+@pytest.mark.benchmark(group="rows2ch")
+@pytest.mark.parametrize("width", ROW_WIDTHS)
+@pytest.mark.parametrize("size", BATCH_SIZES)
+def bench_rows2ch(benchmark, width, size):
+    rows = make_rows(width, size)
+
+    benchmark(rows2ch, *rows)
+
+
+@pytest.mark.benchmark(group="decode")
+@pytest.mark.parametrize("density", ESCAPE_DENSITIES)
+def bench_decode(benchmark, density):
+    value = random_string(1000, density)
+    raw = value.replace("\\", "\\\\").replace("'", "\\'").replace("\t", "\\t").replace("\n", "\\n").encode()
+
+    benchmark(BaseType.decode, raw)
+
+
+@pytest.mark.benchmark(group="seq_parser")
+@pytest.mark.parametrize("items", [10, 1000])
+def bench_seq_parser(benchmark, items):
+    raw = ",".join(f"('{random_string(8)}',[1,2,3])" for _ in range(items))
+
+    benchmark(lambda: list(BaseType.seq_parser(raw)))
+
+
+@pytest.mark.benchmark(group="convert")
+@pytest.mark.parametrize("ch_type", NESTED_TYPES)
+def bench_convert_nested(benchmark, ch_type):
+    values = {
+        "Array(UInt64)": b"[" + b",".join(b"%d" % i for i in range(100)) + b"]",
+        "Array(String)": b"[" + b",".join(b"'item\\\\%d'" % i for i in range(100)) + b"]",
+        "Tuple(String, Nullable(Float64), Date)": b"('text\\'s',NULL,'2020-01-01')",
+        "Array(Tuple(UInt32, String))": b"[" + b",".join(b"(%d,'v%d')" % (i, i) for i in range(100)) + b"]",
+    }
+    converter = what_py_type(ch_type).convert
+
+    benchmark(converter, values[ch_type])
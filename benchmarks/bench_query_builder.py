@@ -0,0 +1,40 @@
+import datetime as dt
+
+import pytest
+
+from clickhouse_utils.query_builder import BaseSQLBuilder
+
+from conftest import BATCH_SIZES, ROW_WIDTHS, make_rows
+
+
+destination = ("bench_db", "bench_table")
+
+
+@pytest.mark.benchmark(group="select")
+@pytest.mark.parametrize("conditions", [0, 5, 30])
+def bench_select(benchmark, conditions):
+    now = dt.datetime(2020, 1, 1)
+    operators = ["exact", "lt", "lte", "gt", "gte"]
+    filter_params = {
+        f"field_{i}__{operators[i % len(operators)]}": now if i % 2 else f"value '{i}'"
+        for i in range(conditions)
+    }
+    fields = [f"field_{i}" for i in range(30)]
+
+    benchmark(
+        BaseSQLBuilder.select,
+        destination,
+        filter_params=filter_params,
+        pagination={"limit": 100, "offset": 0},
+        fields=fields,
+        ordering=["-field_1", "field_2"],
+    )
+
+
+@pytest.mark.benchmark(group="insert")
+@pytest.mark.parametrize("width", ROW_WIDTHS)
+@pytest.mark.parametrize("size", BATCH_SIZES)
+def bench_insert(benchmark, width, size):
+    values = make_rows(width, size)
+
+    benchmark(BaseSQLBuilder.insert, destination, values)
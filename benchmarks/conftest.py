@@ -0,0 +1,89 @@
+import asyncio
+import datetime as dt
+import random
+import string
+
+import pytest
+from aiohttp import ClientSession
+
+from clickhouse_utils.client import ChExecutorClient
+from clickhouse_utils.testing import FakeClickHouse
+
+
+ROW_WIDTHS = [5, 30]
+BATCH_SIZES = [100, 10000]
+ESCAPE_DENSITIES = [0.0, 0.1, 0.5]
+NESTED_TYPES = [
+    "Array(UInt64)",
+    "Array(String)",
+    "Tuple(String, Nullable(Float64), Date)",
+    "Array(Tuple(UInt32, String))",
+]
+
+COLUMN_TYPES = ["UInt64", "String", "DateTime", "Nullable(Float64)", "Array(String)"]
+
+
+def random_string(length: int, escape_density: float = 0.0) -> str:
+    """ String with part of symbols which will be escaped in ClickHouse format """
+    symbols = []
+    for _ in range(length):
+        if random.random() < escape_density:
+            symbols.append(random.choice("\\'\t\n"))
+        else:
+            symbols.append(random.choice(string.ascii_letters))
+    return "".join(symbols)
+
+
+def make_value(ch_type: str, index: int):
+    if ch_type == "UInt64":
+        return index
+    if ch_type == "String":
+        return random_string(20)
+    if ch_type == "DateTime":
+        return dt.datetime(2020, 1, 1) + dt.timedelta(seconds=index)
+    if ch_type == "Nullable(Float64)":
+        return None if index % 5 == 0 else index / 3
+    if ch_type == "Array(String)":
+        return [random_string(5) for _ in range(3)]
+    raise ValueError(ch_type)
+
+
+def make_rows(width: int, size: int) -> list:
+    types = [COLUMN_TYPES[i % len(COLUMN_TYPES)] for i in range(width)]
+    return [tuple(make_value(tp, index) for tp in types) for index in range(size)]
+
+
+def make_columns(width: int) -> list:
+    return [(f"c{i}", COLUMN_TYPES[i % len(COLUMN_TYPES)]) for i in range(width)]
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def fake(loop):
+    """ Prepared responses are rendered once, so server time is small part of measure """
+    fake = FakeClickHouse(discard_inserts=True)
+    # added first, so it wins over table response below in every benchmark
+    fake.add_response(r"^SELECT count\(\) FROM", [("c", "UInt64")], [(100,)])
+    fake.add_response(r"FROM bench\.bench_table", make_columns(5), make_rows(5, 100))
+    loop.run_until_complete(fake.start())
+    yield fake
+    loop.run_until_complete(fake.close())
+
+
+@pytest.fixture(scope="session")
+def ch_client(loop, fake):
+    async def make_session():
+        return ClientSession()
+
+    session = loop.run_until_complete(make_session())
+    client = ChExecutorClient.init_client(
+        session, fake.url, "bench", "bench", "bench", compress_response=False
+    )
+    yield client
+    loop.run_until_complete(session.close())
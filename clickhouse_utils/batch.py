@@ -0,0 +1,263 @@
+import asyncio
+import re
+from functools import partial
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from clickhouse_utils.client import AbstractChExecutorClient
+
+
+RE_SCALAR = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+RE_NOT_FUSED = re.compile(r"\b(FORMAT|SETTINGS|INTO\s+OUTFILE)\b", re.IGNORECASE)
+
+Scalar = Tuple[asyncio.Future, Union[str, Callable[[], Awaitable[str]]]]
+
+
+class QueryBatch(object):
+    """
+    Collect many small read queries and run them in one call.
+    Calls return futures, queries are sent on exit from context (or by execute())
+    concurrently, not more than concurrency at a time.
+    Scalar queries (get_count and raw with "fetchval") are fused in one
+    SELECT (q1) AS v0, (q2) AS v1, ..., so a batch of counters costs one round trip
+
+    Usage:
+
+    async with click_house_client.batch(concurrency=8) as batch:
+        user = batch.get_object("users", {"id": 1})
+        events = batch.get_count(table="events", filter_params={"user_id": 1})
+        last_seen = batch.raw("SELECT max(ts) FROM visits WHERE user_id = 1", "fetchval")
+
+    print(user.result(), events.result(), await last_seen)
+
+    If fused query fails, its queries are repeated one by one, so error of
+    one query doesn't affect others. Fused raw query must return one column,
+    scalar subquery of many columns is tuple, use fuse=False for such query.
+    """
+
+    def __init__(
+        self,
+        client: "AbstractChExecutorClient",
+        concurrency: int = 10,
+        fuse: bool = True,
+        max_fused: int = 50,
+    ):
+        """
+
+        :param client: client which execute queries
+        :param concurrency: max number of queries at a time
+        :param fuse: fuse scalar queries in one SELECT
+        :param max_fused: max number of scalar queries in one SELECT
+        """
+        assert concurrency > 0, "concurrency must be positive"
+        assert max_fused > 0, "max_fused must be positive"
+
+        self.client = client
+        self.concurrency = concurrency
+        self.fuse = fuse
+        self.max_fused = max_fused
+        self._calls = []
+        self._scalars = []
+
+    async def __aenter__(self) -> "QueryBatch":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            await self.execute()
+        else:
+            self.cancel()
+
+    def __len__(self) -> int:
+        return len(self._calls) + len(self._scalars)
+
+    @staticmethod
+    def _future() -> asyncio.Future:
+        return asyncio.get_running_loop().create_future()
+
+    def _add(self, method: Callable[..., Awaitable[Any]], *args, **kwargs) -> asyncio.Future:
+        future = self._future()
+        self._calls.append((future, partial(method, *args, **kwargs)))
+        return future
+
+    def _add_scalar(self, sql: Union[str, Callable[[], Awaitable[str]]]) -> asyncio.Future:
+        future = self._future()
+        self._scalars.append((future, sql))
+        return future
+
+    def get_list(self, *args, **kwargs) -> asyncio.Future:
+        """ Future of client.get_list with the same params """
+        return self._add(self.client.get_list, *args, **kwargs)
+
+    def get_object(self, *args, **kwargs) -> asyncio.Future:
+        """ Future of client.get_object with the same params """
+        return self._add(self.client.get_object, *args, **kwargs)
+
+    def get_aggregate(self, *args, **kwargs) -> asyncio.Future:
+        """ Future of client.get_aggregate with the same params """
+        return self._add(self.client.get_aggregate, *args, **kwargs)
+
+    def get_count(
+        self,
+        query: Optional[str] = None,
+        table: Optional[str] = None,
+        filter_params: Optional[dict] = None,
+        fields: Optional[List[str]] = None,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+        estimate: bool = False,
+        **kwargs,
+    ) -> asyncio.Future:
+        """
+        Future of client.get_count with the same params,
+        exact count without query settings in kwargs is fused with other scalar queries
+
+        :return: future of count rows
+        """
+        assert (query is not None) or (table is not None), "must be use query or table"
+
+        if not self.fuse or estimate or kwargs:
+            return self._add(
+                self.client.get_count,
+                query,
+                table,
+                filter_params,
+                fields,
+                prewhere,
+                sample,
+                final,
+                estimate,
+                **kwargs,
+            )
+
+        return self._add_scalar(
+            partial(
+                self.client._count_query, query, table, filter_params, prewhere, sample, final
+            )
+        )
+
+    def raw(self, query: str, command: str = "fetch", fuse: bool = True, **kwargs) -> asyncio.Future:
+        """
+        Future of client.raw with the same params,
+        "fetchval" of SELECT without query settings in kwargs is fused with other scalar queries
+
+        :param query: complete SQL query
+        :param command: one of command: "fetch", "fetchval", "execute", "fetchrow"
+        :param fuse: False - query is sent separately
+        :return: future of result of command
+        """
+        assert command != "iterate", "iterate isn't accepted in batch"
+
+        query = query.strip().rstrip(";")
+        if (
+            self.fuse
+            and fuse
+            and command == "fetchval"
+            and not kwargs
+            and RE_SCALAR.match(query)
+            and not RE_NOT_FUSED.search(query)
+        ):
+            return self._add_scalar(query)
+
+        return self._add(self.client.raw, query, command, **kwargs)
+
+    def cancel(self) -> None:
+        """ Cancel futures of calls which isn't executed """
+        for future, _ in self._calls + self._scalars:
+            future.cancel()
+        self._calls, self._scalars = [], []
+
+    async def execute(self) -> None:
+        """
+        Send collected queries, result or error of each query is set in its future.
+        Batch is empty after execute and can be filled again
+        """
+        calls, scalars = self._calls, self._scalars
+        self._calls, self._scalars = [], []
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        scalars = [scalar for scalar in scalars if not scalar[0].done()]
+        groups = [
+            scalars[start:start + self.max_fused]
+            for start in range(0, len(scalars), self.max_fused)
+        ]
+
+        await asyncio.gather(
+            *(self._run_call(semaphore, future, call) for future, call in calls),
+            *(self._run_fused(semaphore, group) for group in groups),
+        )
+
+    @staticmethod
+    async def _scalar_sql(sql: Union[str, Callable[[], Awaitable[str]]]) -> str:
+        if isinstance(sql, str):
+            return sql
+        return await sql()
+
+    async def _run_call(
+        self,
+        semaphore: asyncio.Semaphore,
+        future: asyncio.Future,
+        call: Callable[[], Awaitable[Any]],
+    ) -> None:
+        if future.done():
+            return
+        async with semaphore:
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _resolve(future, error=e)
+            else:
+                _resolve(future, result)
+
+    async def _run_fused(self, semaphore: asyncio.Semaphore, group: List[Scalar]) -> None:
+        if len(group) == 1:
+            future, sql = group[0]
+            await self._run_call(semaphore, future, partial(self._fetch_scalar, sql))
+            return
+
+        try:
+            queries = await asyncio.gather(*(self._scalar_sql(sql) for _, sql in group))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            queries = None
+
+        if queries is not None:
+            fused = "SELECT " + ", ".join(
+                f"({query}) AS v{index}" for index, query in enumerate(queries)
+            )
+            async with semaphore:
+                try:
+                    row = await self.client.raw(fused, "fetchrow")
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    row = None
+            if row is not None:
+                for index, (future, _) in enumerate(group):
+                    _resolve(future, row[index])
+                return
+
+        # repeat one by one, error is set only in future of failed query
+        await asyncio.gather(
+            *(
+                self._run_call(semaphore, future, partial(self._fetch_scalar, sql))
+                for future, sql in group
+            )
+        )
+
+    async def _fetch_scalar(self, sql: Union[str, Callable[[], Awaitable[str]]]) -> Any:
+        return await self.client.raw(await self._scalar_sql(sql), "fetchval")
+
+
+def _resolve(future: asyncio.Future, result: Any = None, error: Optional[Exception] = None) -> None:
+    """ Set result in future, if it isn't cancelled by caller """
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
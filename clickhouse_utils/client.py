@@ -1,10 +1,61 @@
+import asyncio
+import json
+import math
+import re
+import uuid
+from contextlib import asynccontextmanager
+
 from aiochclient import ChClient
-from aiochclient.records import Record
-from aiohttp import ClientSession
-from typing import NoReturn, List, Optional, Any
+from aiochclient.exceptions import ChClientError
+from aiochclient.records import Record, RecordsFabric
+from aiohttp import ClientSession, ClientResponse
+from os import PathLike
+from typing import BinaryIO, NoReturn, List, Optional, Any, AsyncIterator, Callable, Dict, Tuple, Union
+
 from abc import ABC
 
+from clickhouse_utils.batch import QueryBatch
+from clickhouse_utils.connection import ConnectionSettings, pool_stats
+from clickhouse_utils.exceptions import InsertError
+from clickhouse_utils.files import (
+    DEFAULT_CHUNK_SIZE,
+    FileSource,
+    open_target,
+    read_chunks,
+    write_chunk,
+    written_rows,
+)
+from clickhouse_utils.export import (
+    ExportBatch,
+    PartProgress,
+    _PartDone,
+    _PartError,
+    drain,
+    part_filters,
+    range_bounds,
+)
+from clickhouse_utils.insert import (
+    AsyncInsertSettings,
+    InsertBlockResult,
+    InsertMetrics,
+    split_blocks,
+    block_token,
+)
 from clickhouse_utils.query_builder import BaseSQLBuilder
+from clickhouse_utils.records import LazyRecordsFabric
+from clickhouse_utils.retry import RetryPolicy
+from clickhouse_utils.sql.mapper import py2ch
+
+
+# statements without result rows, other statements (SELECT, SHOW, EXPLAIN, ...) are read
+# statement can start with comments: "-- report\nINSERT ..." or "/* report */ INSERT ..."
+RE_NO_ROWS = re.compile(
+    r"^(?:\s*(?:--[^\n]*(?:\n|$)|/\*.*?\*/))*"
+    r"\s*(INSERT|CREATE|ALTER|DROP|TRUNCATE|RENAME|EXCHANGE|OPTIMIZE|ATTACH|DETACH|"
+    r"SYSTEM|SET|USE|GRANT|REVOKE|DELETE|UPDATE)\b",
+    re.IGNORECASE | re.DOTALL,
+)
+RE_FORMAT = re.compile(r"\bFORMAT\s+(\w+)\s*;?\s*$", re.IGNORECASE)
 
 
 class AbstractChExecutorClient(ABC):
@@ -12,29 +63,69 @@ class AbstractChExecutorClient(ABC):
     Usage:
 
     click_house_client  = AbstractChExecutorClient.init_client(session, url, user, password, database)
+
+    # session with tuned connection pool is owned by client, close it with client.close()
+    click_house_client  = AbstractChExecutorClient.init_client(None, url, user, password, database)
+    await click_house_client.warm_up(10)
     obj = click_house_client.get_object("table", filter_params=filter_params, fields=fields)
 
     objs = await click_house_client.get_list("table", filter_params=filter_params, fields=fields, pagination=pagination)
 
     count = await click_house_client.get_count(query)
 
+    rows = await click_house_client.get_aggregate(
+        "table", {"total": "amount__sum", "n": "count"}, filter_params, group_by=["user_id"]
+    )
+
     await click_house_client.create("table", values)
 
+    # insert by blocks of 10000 rows, each block is retried and deduplicated by ClickHouse
+    results = await click_house_client.create("table", values, block_size=10000)
+
     await click_house_client.raw(query, "fetch")
+
+    async with click_house_client.batch() as batch:
+        obj = batch.get_object("table", filter_params=filter_params)
+        count = batch.get_count(table="table", filter_params=filter_params)
+    print(obj.result(), count.result())
+
+    async for batch in click_house_client.parallel_export("table", split_by="id", parts=8):
+        process(batch.rows)
+
+    await click_house_client.export_to_file(query, "dump.parquet", "Parquet")
+
+    await click_house_client.import_from_file("table", "dump.parquet", "Parquet")
     """
 
     sql_builder = BaseSQLBuilder
 
     def __init__(
         self,
-        session: ClientSession,
+        session: Optional[ClientSession],
         url: str,
         user: str,
         password: str,
         database: str,
         compress_response: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+        insert_deduplication: bool = True,
+        async_insert: Optional[AsyncInsertSettings] = None,
+        connection_settings: Optional[ConnectionSettings] = None,
     ) -> NoReturn:
 
+        self.owns_session = session is None
+        if self.owns_session:
+            connection_settings = connection_settings or ConnectionSettings()
+            session = connection_settings.make_session()
+
+        self.session = session
+        self.url = url
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.insert_deduplication = insert_deduplication
+        self.async_insert = async_insert
+        self.insert_metrics = InsertMetrics()
+        self._column_sizes = {}
+        self._kill_tasks = set()
         self.client = ChClient(
             session=session,
             url=url,
@@ -48,33 +139,95 @@ class AbstractChExecutorClient(ABC):
     @classmethod
     def init_client(
         cls,
-        session: ClientSession,
+        session: Optional[ClientSession],
         url: str,
         user: str,
         password: str,
         database: str,
         compress_response: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+        insert_deduplication: bool = True,
+        async_insert: Optional[AsyncInsertSettings] = None,
+        connection_settings: Optional[ConnectionSettings] = None,
     ):
         """
         create client for ClickHouse
 
-        :param session: aiohttp session for connect with ClickHouse
+        :param session: aiohttp session for connect with ClickHouse, None - client create
+            own session with connection_settings, it must be called inside running event loop
         :param url: address to ClickHouse
         :param user: name database user
         :param password: password for user
         :param database: database name
         :param compress_response: True or False
+        :param retry_policy: retry settings for insert, by default 3 attempts
+        :param insert_deduplication: send insert_deduplication_token with each insert block
+        :param async_insert: default settings of server-side insert buffering
+        :param connection_settings: connection pool of own session, by default ConnectionSettings()
         :return: class instance
         """
         raise NotImplementedError
 
-    async def create(self, table: str, values: List[tuple], **kwargs) -> None:
+    async def __aenter__(self) -> "AbstractChExecutorClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Close session if it is owned by client, session from caller isn't closed
+        """
+        if self.owns_session and not self.session.closed:
+            await self.session.close()
+
+    def pool_stats(self) -> Dict[str, int]:
+        """
+        :return: limits, number of connections in use and idle connections of session
+        """
+        return pool_stats(self.session)
+
+    async def warm_up(self, connections: int = 1) -> int:
+        """
+        Open connections before first queries, they stay in pool with keep-alive
+
+        :param connections: number of concurrent connections
+        :return: number of successful connections
+        """
+        raise NotImplementedError
+
+    async def create(
+        self,
+        table: str,
+        values: List[tuple],
+        fields: List[str] = None,
+        block_size: Optional[int] = None,
+        deduplication_token: Optional[str] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        raise_on_error: bool = True,
+        async_insert: Optional[AsyncInsertSettings] = None,
+        **kwargs,
+    ) -> List[InsertBlockResult]:
         """
         Insert data in table
 
+        Values are split on blocks, each block is sent in separate INSERT with
+        insert_deduplication_token and retried with exponential backoff.
+        ClickHouse skip replayed blocks (Replicated*MergeTree or
+        non_replicated_deduplication_window for MergeTree)
+
         :param table: name table in database
         :param values: values which will be insert in table
-        :return: None
+        :param fields: name fields for insert
+        :param block_size: max rows in one block, None - all rows in one block
+        :param deduplication_token: token from caller, by default token is hash of block
+        :param retry_policy: retry settings, by default client retry policy
+        :param raise_on_error: raise InsertError if some blocks weren't inserted
+        :param async_insert: server-side insert buffering, by default client settings
+        :param query_id: id of query, with many blocks "{query_id}-{index}" for each block
+        :param timeout: seconds for whole insert, blocks which aren't inserted before
+            deadline are failed with asyncio.TimeoutError and aren't retried
+        :return: result for each block
         """
         raise NotImplementedError
 
@@ -85,6 +238,10 @@ class AbstractChExecutorClient(ABC):
         pagination: Optional[dict] = None,
         fields: Optional[List[str]] = None,
         ordering: Optional[List[str]] = None,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+        lazy: bool = False,
         **kwargs,
     ) -> List[Record]:
         """
@@ -95,6 +252,11 @@ class AbstractChExecutorClient(ABC):
         :param pagination: dict with values limit and offset
         :param fields: list fields which will be use in select
         :param ordering: ORDER BY fields
+        :param prewhere: conditions for PREWHERE, True - move conditions by the narrowest
+            column from filter_params (sizes from system.columns are cached)
+        :param sample: SAMPLE clause, part of data (0.1) or number of rows
+        :param final: add FINAL modifier
+        :param lazy: decode cell of row on first access, see clickhouse_utils.records.LazyRecord
         :return: list records
         """
         raise NotImplementedError
@@ -104,6 +266,10 @@ class AbstractChExecutorClient(ABC):
         table: str,
         filter_params: Optional[dict] = None,
         fields: Optional[List[str]] = None,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+        lazy: bool = False,
         **kwargs,
     ) -> Optional[Record]:
         """
@@ -112,6 +278,11 @@ class AbstractChExecutorClient(ABC):
         :param table: name table in database
         :param filter_params: params which will be use in condition
         :param fields: list fields which will be use in select
+        :param prewhere: conditions for PREWHERE, True - move conditions by the narrowest
+            column from filter_params (sizes from system.columns are cached)
+        :param sample: SAMPLE clause, part of data (0.1) or number of rows
+        :param final: add FINAL modifier
+        :param lazy: decode cell of row on first access, see clickhouse_utils.records.LazyRecord
         :return: first row from list records
         """
         raise NotImplementedError
@@ -122,28 +293,169 @@ class AbstractChExecutorClient(ABC):
         table: Optional[str] = None,
         filter_params: Optional[dict] = None,
         fields: Optional[List[str]] = None,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+        estimate: bool = False,
         **kwargs,
     ) -> Optional[int]:
         """
         Fetch first value of the first row from query result or None
 
-        Don't use query if contain table. Use case - pagination
+        Don't use query if contain table. Use case - pagination.
+        With table count is built without subquery, so ClickHouse can answer from metadata of parts
 
         :param query: complete SQL query, which use how subquery
         :param table: table name in database
         :param filter_params: params which will be use in condition
-        :param fields: list fields which will be use in select
+        :param fields: not used with table, left for compatibility
+        :param prewhere: conditions for PREWHERE, True - move conditions by the narrowest
+            column from filter_params (sizes from system.columns are cached)
+        :param sample: SAMPLE clause, count is estimated by _sample_factor
+        :param final: add FINAL modifier
+        :param estimate: number of rows from system.tables without reading of data,
+            only for table without conditions and FINAL, else (or if engine doesn't
+            store total_rows) count is exact
         :return: return count rows in query
         """
         raise NotImplementedError
 
+    async def get_aggregate(
+        self,
+        table: str,
+        aggregations: Dict[str, Union[str, tuple]],
+        filter_params: Optional[dict] = None,
+        group_by: Optional[List[str]] = None,
+        having: Optional[dict] = None,
+        ordering: Optional[List[str]] = None,
+        pagination: Optional[dict] = None,
+        with_totals: bool = False,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+        lazy: bool = False,
+        **kwargs,
+    ) -> Union[List[Record], Tuple[List[Record], Optional[Record]]]:
+        """
+        Aggregate rows of table in ClickHouse
+
+        :param table: name table in database
+        :param aggregations: Key - alias, Value - "field__function", "function"
+            or ("field__function", params) for parametric functions like quantiles
+        :param filter_params: params which will be use in condition
+        :param group_by: GROUP BY fields
+        :param having: conditions by aliases, same syntax as filter_params
+        :param ordering: ORDER BY fields or aliases
+        :param pagination: dict with values limit and offset
+        :param with_totals: add WITH TOTALS, result will be tuple of rows and totals row,
+            only with group_by
+        :param prewhere: conditions for PREWHERE, True - move conditions by the narrowest
+            column from filter_params (sizes from system.columns are cached)
+        :param sample: SAMPLE clause, part of data (0.1) or number of rows
+        :param final: add FINAL modifier
+        :param lazy: decode cell of row on first access, see clickhouse_utils.records.LazyRecord
+        :return: list records
+        """
+        raise NotImplementedError
+
+    def parallel_export(
+        self,
+        table: str,
+        filter_params: Optional[dict] = None,
+        split_by: str = None,
+        parts: int = 4,
+        mode: str = "range",
+        fields: Optional[List[str]] = None,
+        ordered: bool = False,
+        concurrency: Optional[int] = None,
+        batch_size: int = 10000,
+        progress: Optional[Callable[[PartProgress], Any]] = None,
+        **kwargs,
+    ) -> AsyncIterator[ExportBatch]:
+        """
+        Split SELECT from table on disjoint parts and fetch them concurrently
+
+        :param table: name table in database
+        :param filter_params: params which will be use in condition
+        :param split_by: numeric, date or datetime field for range mode, any expression for hash mode.
+            Rows with NULL in split_by aren't exported in range mode
+        :param parts: number of parts
+        :param mode: "range" - by min and max of split_by, "hash" - by cityHash64(split_by) % parts
+        :param fields: list fields which will be use in select
+        :param ordered: yield parts one by one in order of split, else batches as soon as they fetched
+        :param concurrency: max number of concurrent queries, by default number of parts
+        :param batch_size: max rows in one batch
+        :param progress: callback which receive progress of part after each batch
+        :return: batches with number of part
+        """
+        raise NotImplementedError
+
+    async def export_to_file(
+        self,
+        query: str,
+        target: Union[str, PathLike, BinaryIO],
+        format: str = "TSV",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        settings: Optional[dict] = None,
+        **kwargs,
+    ) -> int:
+        """
+        Write query result in file as is, without decoding of rows
+
+        :param query: complete SQL query without FORMAT
+        :param target: path or file-like object with write method
+        :param format: ClickHouse output format, for example Parquet, CSVWithNames, Native, TSV
+        :param chunk_size: size of chunk in bytes
+        :param settings: ClickHouse settings for query
+        :param query_id: id of query, by default it is generated
+        :param timeout: seconds for whole export, query is killed after it
+        :return: number of written bytes
+        """
+        raise NotImplementedError
+
+    async def import_from_file(
+        self,
+        table: str,
+        source: FileSource,
+        format: str = "TSV",
+        fields: Optional[List[str]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        settings: Optional[dict] = None,
+        **kwargs,
+    ) -> Optional[int]:
+        """
+        Stream file as body of INSERT, data isn't parsed on client
+
+        :param table: name table in database
+        :param source: path, file-like object or object with buffer protocol (bytes, mmap.mmap)
+        :param format: ClickHouse input format, for example Parquet, CSVWithNames, Native, TSV
+        :param fields: name fields for insert
+        :param chunk_size: size of chunk in bytes
+        :param settings: ClickHouse settings for query
+        :param query_id: id of query, by default it is generated
+        :param timeout: seconds for whole import, query is killed after it
+        :return: number of written rows from X-ClickHouse-Summary or None
+        """
+        raise NotImplementedError
+
+    def batch(self, concurrency: int = 10, fuse: bool = True, max_fused: int = 50) -> QueryBatch:
+        """
+        Collect read queries and run them in one call, see clickhouse_utils.batch.QueryBatch
+
+        :param concurrency: max number of queries at a time
+        :param fuse: fuse scalar queries (get_count, raw with "fetchval") in one SELECT
+        :param max_fused: max number of scalar queries in one SELECT
+        :return: batch, queries are sent on exit from async with
+        """
+        raise NotImplementedError
+
     async def raw(self, query: str, command: str = "fetch", **kwargs) -> Any:
         """
         Execute complete SQL query
 
         :param query: complete SQL query
         :param command: one of command: "fetch", "fetchval", "execute", "fetchrow", "iterate"
-        :return: depend on command
+        :return: depend on command, async generator of rows for "iterate"
         """
         raise NotImplementedError
 
@@ -152,23 +464,351 @@ class ChExecutorClient(AbstractChExecutorClient):
     @classmethod
     def init_client(
         cls,
-        session: ClientSession,
+        session: Optional[ClientSession],
         url: str,
         user: str,
         password: str,
         database: str,
         compress_response: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+        insert_deduplication: bool = True,
+        async_insert: Optional[AsyncInsertSettings] = None,
+        connection_settings: Optional[ConnectionSettings] = None,
     ):
 
-        return cls(session, url, user, password, database, compress_response)
+        return cls(
+            session,
+            url,
+            user,
+            password,
+            database,
+            compress_response,
+            retry_policy,
+            insert_deduplication,
+            async_insert,
+            connection_settings,
+        )
+
+    @asynccontextmanager
+    async def _request(
+        self,
+        query: str,
+        data: Any = None,
+        settings: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[ClientResponse]:
+        """
+        Send query to ClickHouse HTTP interface with additional settings.
+        Query is killed if coroutine is cancelled or timeout is expired
+
+        :param query: complete SQL query
+        :param data: request body, if it is used query will be sent in params
+        :param settings: ClickHouse settings for this query, query_id is generated if it isn't set
+        :param timeout: seconds for receive response headers, it is sent as max_execution_time
+        :return: response with status 200
+        """
+        settings = {**(settings or {})}
+        query_id = settings.setdefault("query_id", str(uuid.uuid4()))
+        if timeout is not None:
+            settings.setdefault("max_execution_time", max(1, math.ceil(timeout)))
+
+        params = {**self.client.params}
+        params.update(
+            (key, int(value) if isinstance(value, bool) else value)
+            for key, value in settings.items()
+        )
+
+        if data is None:
+            data = query.encode()
+        else:
+            params["query"] = query
+
+        try:
+            request = self.session.post(self.url, params=params, data=data)
+            resp = await (asyncio.wait_for(request, timeout) if timeout else request)
+            async with resp:
+                if resp.status != 200:
+                    raise ChClientError((await resp.read()).decode(errors="replace"))
+                yield resp
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self._kill_query(query_id)
+            raise
+
+    def _kill_query(self, query_id: str) -> None:
+        """ Best-effort KILL QUERY in background, it isn't cancelled with caller """
+        task = asyncio.ensure_future(self._send_kill_query(query_id))
+        self._kill_tasks.add(task)
+        task.add_done_callback(self._kill_tasks.discard)
+
+    async def _send_kill_query(self, query_id: str) -> None:
+        query = f"KILL QUERY WHERE query_id = {py2ch(query_id).decode()} ASYNC"
+        try:
+            async with self.session.post(
+                self.url, params=self.client.params, data=query.encode()
+            ) as resp:
+                await resp.read()
+        except Exception:
+            pass
+
+    @staticmethod
+    async def _read_line(resp: ClientResponse, deadline: Optional[float]) -> bytes:
+        if deadline is None:
+            return await resp.content.readline()
+
+        remaining = deadline - asyncio.get_event_loop().time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(resp.content.readline(), remaining)
+
+    @staticmethod
+    async def _read_chunk(
+        resp: ClientResponse, chunk_size: int, deadline: Optional[float]
+    ) -> bytes:
+        if deadline is None:
+            return await resp.content.read(chunk_size)
+
+        remaining = deadline - asyncio.get_event_loop().time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(resp.content.read(chunk_size), remaining)
+
+    async def _iterate(
+        self,
+        query: str,
+        query_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        settings: Optional[dict] = None,
+        lazy: bool = False,
+        **kwargs,
+    ) -> AsyncIterator[Record]:
+        """
+        Execute query and yield rows one by one
+
+        :param query: complete SQL query, without FORMAT or with FORMAT JSONEachRow
+        :param query_id: id of query, by default it is generated
+        :param timeout: seconds for whole query
+        :param settings: ClickHouse settings for this query
+        :param lazy: yield LazyRecord, cells are decoded on first access
+        :return: records, dicts for JSONEachRow
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = asyncio.get_event_loop().time() + timeout
+
+        settings = {**(settings or {})}
+        query_id = query_id or settings.get("query_id") or str(uuid.uuid4())
+        settings["query_id"] = query_id
+
+        format_match = RE_FORMAT.search(query)
+        is_json = bool(format_match) and format_match.group(1).lower() == "jsoneachrow"
+        if format_match and not is_json:
+            raise ChClientError("Only JSONEachRow format can be fetched, use export_to_file")
+
+        need_fetch = not RE_NO_ROWS.match(query)
+        if need_fetch and not format_match:
+            # on new line, so trailing "-- comment" of query doesn't hide FORMAT
+            query += "\nFORMAT TSVWithNamesAndTypes"
+
+        async with self._request(query, settings=settings, timeout=timeout) as resp:
+            if not need_fetch:
+                return
+
+            try:
+                if is_json:
+                    while True:
+                        line = await self._read_line(resp, deadline)
+                        if not line:
+                            return
+                        yield json.loads(line)
+
+                names = await self._read_line(resp, deadline)
+                if not names:
+                    return
+                fabric = LazyRecordsFabric if lazy else RecordsFabric
+                rf = fabric(names=names, tps=await self._read_line(resp, deadline))
+                while True:
+                    line = await self._read_line(resp, deadline)
+                    if not line:
+                        return
+                    yield rf.new(line)
+            except GeneratorExit:
+                # rows aren't read to the end (fetchrow, break), server would go on
+                # with query for closed connection
+                if not resp.content.is_eof():
+                    self._kill_query(query_id)
+                raise
+
+    async def _execute(self, query: str, **kwargs) -> None:
+        async for _ in self._iterate(query, **kwargs):
+            pass
+
+    async def _fetch(self, query: str, **kwargs) -> List[Record]:
+        return [row async for row in self._iterate(query, **kwargs)]
+
+    async def _fetchrow(self, query: str, **kwargs) -> Optional[Record]:
+        rows = self._iterate(query, **kwargs)
+        try:
+            async for row in rows:
+                # one more read reaches end of stream of query with LIMIT 1,
+                # query with other rows is killed on close
+                try:
+                    await rows.__anext__()
+                except StopAsyncIteration:
+                    pass
+                return row
+            return None
+        finally:
+            # release connection without waiting of rest rows
+            await rows.aclose()
+
+    async def _fetchval(self, query: str, **kwargs) -> Any:
+        row = await self._fetchrow(query, **kwargs)
+        if row:
+            return row[0]
+        return None
+
+    async def warm_up(self, connections: int = 1) -> int:
+
+        async def ping() -> bool:
+            async with self._request("SELECT 1") as resp:
+                await resp.read()
+            return True
+
+        results = await asyncio.gather(
+            *(ping() for _ in range(connections)), return_exceptions=True
+        )
+        return sum(1 for result in results if result is True)
+
+    async def _insert_block(
+        self,
+        index: int,
+        query: str,
+        rows: int,
+        token: Optional[str],
+        retry_policy: RetryPolicy,
+        async_insert: Optional[AsyncInsertSettings] = None,
+        query_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> InsertBlockResult:
+        settings = {}
+        if query_id:
+            settings["query_id"] = query_id
+        if token:
+            settings["insert_deduplication_token"] = token
+
+        flushed = True
+        if async_insert and async_insert.enabled:
+            settings.update(async_insert.to_settings())
+            flushed = async_insert.flushed
+            if token:
+                # without it async inserts ignore insert_deduplication_token
+                settings["async_insert_deduplicate"] = 1
+
+        attempt = 0
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - asyncio.get_event_loop().time()
+                if timeout <= 0:
+                    error = asyncio.TimeoutError()
+                    return InsertBlockResult(index, rows, token, attempt, error, False)
+
+            attempt += 1
+            try:
+                async with self._request(query, settings=settings, timeout=timeout):
+                    pass
+            except Exception as e:
+                if not retry_policy.can_retry(attempt, e):
+                    return InsertBlockResult(index, rows, token, attempt, e, False)
+                delay = retry_policy.delay(attempt)
+                if deadline is not None:
+                    delay = min(delay, max(0, deadline - asyncio.get_event_loop().time()))
+                await asyncio.sleep(delay)
+            else:
+                return InsertBlockResult(index, rows, token, attempt, None, flushed)
 
     async def create(
-        self, table: str, values: List[tuple], fields: List[str] = None, **kwargs
-    ) -> None:
+        self,
+        table: str,
+        values: List[tuple],
+        fields: List[str] = None,
+        block_size: Optional[int] = None,
+        deduplication_token: Optional[str] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        raise_on_error: bool = True,
+        async_insert: Optional[AsyncInsertSettings] = None,
+        query_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> List[InsertBlockResult]:
 
-        query = self.sql_builder.insert((self.database, table), values, fields)
+        retry_policy = retry_policy or self.retry_policy
+        async_insert = async_insert or self.async_insert
 
-        return await self.client.execute(query)
+        deadline = None
+        if timeout is not None:
+            deadline = asyncio.get_event_loop().time() + timeout
+
+        many_blocks = bool(block_size) and block_size < len(values)
+        results = []
+        for index, block in enumerate(split_blocks(values, block_size)):
+            query = self.sql_builder.insert((self.database, table), block, fields)
+            token = None
+            if self.insert_deduplication:
+                token = block_token(query, index, deduplication_token)
+
+            block_query_id = query_id
+            if query_id and many_blocks:
+                block_query_id = f"{query_id}-{index}"
+
+            result = await self._insert_block(
+                index,
+                query,
+                len(block),
+                token,
+                retry_policy,
+                async_insert,
+                block_query_id,
+                deadline,
+            )
+            self.insert_metrics.add(result)
+            results.append(result)
+
+        failed = [result for result in results if not result.ok]
+        if failed and raise_on_error:
+            raise InsertError(
+                f"{len(failed)} of {len(results)} blocks weren't inserted", results
+            )
+
+        return results
+
+    async def column_sizes(self, table: str, refresh: bool = False) -> Dict[str, int]:
+        """
+        Compressed size of table columns from system.columns, result is cached
+
+        :param table: name table in database
+        :param refresh: fetch sizes again
+        :return: column name and size in bytes
+        """
+        if refresh or table not in self._column_sizes:
+            query = self.sql_builder.select(
+                ("system", "columns"),
+                filter_params={"database": self.database, "table": table},
+                fields=["name", "data_compressed_bytes"],
+            )
+            rows = await self._fetch(query)
+            self._column_sizes[table] = {row[0]: row[1] for row in rows}
+
+        return self._column_sizes[table]
+
+    async def _route_prewhere(
+        self, table: str, filter_params: Optional[dict], prewhere: Union[dict, bool, None]
+    ) -> Tuple[Optional[dict], Optional[dict]]:
+        if prewhere is True:
+            return self.sql_builder.split_prewhere(
+                filter_params, await self.column_sizes(table)
+            )
+        return prewhere or None, filter_params
 
     async def get_list(
         self,
@@ -177,28 +817,51 @@ class ChExecutorClient(AbstractChExecutorClient):
         pagination: Optional[dict] = None,
         fields: Optional[List[str]] = None,
         ordering: Optional[List[str]] = None,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+        lazy: bool = False,
         **kwargs,
     ) -> List[Record]:
 
+        prewhere, filter_params = await self._route_prewhere(table, filter_params, prewhere)
         query = self.sql_builder.select(
-            (self.database, table), filter_params, pagination, fields, ordering
+            (self.database, table),
+            filter_params,
+            pagination,
+            fields,
+            ordering,
+            prewhere_params=prewhere,
+            sample=sample,
+            final=final,
         )
 
-        return await self.client.fetch(query)
+        return await self._fetch(query, lazy=lazy, **kwargs)
 
     async def get_object(
         self,
         table: str,
         filter_params: Optional[dict] = None,
         fields: Optional[List[str]] = None,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+        lazy: bool = False,
         **kwargs,
     ) -> Optional[Record]:
 
+        prewhere, filter_params = await self._route_prewhere(table, filter_params, prewhere)
         query = self.sql_builder.select(
-            (self.database, table), filter_params=filter_params, fields=fields
+            (self.database, table),
+            filter_params=filter_params,
+            pagination={"limit": 1, "offset": 0},
+            fields=fields,
+            prewhere_params=prewhere,
+            sample=sample,
+            final=final,
         )
 
-        return await self.client.fetchrow(query)
+        return await self._fetchrow(query, lazy=lazy, **kwargs)
 
     async def get_count(
         self,
@@ -206,19 +869,280 @@ class ChExecutorClient(AbstractChExecutorClient):
         table: Optional[str] = None,
         filter_params: Optional[dict] = None,
         fields: Optional[List[str]] = None,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+        estimate: bool = False,
         **kwargs,
     ) -> Optional[int]:
 
         assert (query is not None) or (table is not None), "must be use query or table"
 
-        if table:
-            query = self.sql_builder.select(
-                (self.database, table), filter_params=filter_params, fields=fields
+        # metadata counts rows which FINAL would merge away
+        if table and estimate and not (filter_params or prewhere or sample is not None or final):
+            count = await self._estimate_count(table, **kwargs)
+            if count is not None:
+                return count
+
+        count_query = await self._count_query(
+            query, table, filter_params, prewhere, sample, final
+        )
+
+        return await self._fetchval(count_query, **kwargs)
+
+    async def _count_query(
+        self,
+        query: Optional[str] = None,
+        table: Optional[str] = None,
+        filter_params: Optional[dict] = None,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+    ) -> str:
+        """ SQL of exact count, the same as in get_count """
+        if not table:
+            return f"""SELECT count() FROM ({query}) AS c_t"""
+
+        prewhere, filter_params = await self._route_prewhere(table, filter_params, prewhere)
+        return self.sql_builder.count(
+            (self.database, table),
+            filter_params=filter_params,
+            prewhere_params=prewhere,
+            sample=sample,
+            final=final,
+        )
+
+    async def _estimate_count(self, table: str, **kwargs) -> Optional[int]:
+        """
+        Number of rows from metadata of table, without reading of data
+
+        :param table: table name in database
+        :return: total_rows from system.tables, None if engine doesn't store it
+            (Distributed, View, Merge, Buffer) or table isn't found
+        """
+        query = self.sql_builder.select(
+            ("system", "tables"),
+            filter_params={"database": self.database, "name": table},
+            fields=["total_rows"],
+        )
+        return await self._fetchval(query, **kwargs)
+
+    async def get_aggregate(
+        self,
+        table: str,
+        aggregations: Dict[str, Union[str, tuple]],
+        filter_params: Optional[dict] = None,
+        group_by: Optional[List[str]] = None,
+        having: Optional[dict] = None,
+        ordering: Optional[List[str]] = None,
+        pagination: Optional[dict] = None,
+        with_totals: bool = False,
+        prewhere: Union[dict, bool, None] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+        lazy: bool = False,
+        **kwargs,
+    ) -> Union[List[Record], Tuple[List[Record], Optional[Record]]]:
+
+        prewhere, filter_params = await self._route_prewhere(table, filter_params, prewhere)
+        query = self.sql_builder.aggregate(
+            (self.database, table),
+            aggregations,
+            filter_params=filter_params,
+            group_by=group_by,
+            having=having,
+            ordering=ordering,
+            pagination=pagination,
+            with_totals=with_totals,
+            prewhere_params=prewhere,
+            sample=sample,
+            final=final,
+        )
+
+        records = await self._fetch(query, lazy=lazy, **kwargs)
+        if not with_totals:
+            return records
+
+        # totals row is separated from rows by empty row
+        for index, record in enumerate(records):
+            if not len(record):
+                totals = records[index + 1] if index + 1 < len(records) else None
+                return records[:index], totals
+
+        return records, None
+
+    async def _export_part(
+        self,
+        part: int,
+        query: str,
+        batch_size: int,
+        semaphore: asyncio.Semaphore,
+        queue: asyncio.Queue,
+        progress: Optional[Callable[[PartProgress], Any]] = None,
+        query_id: Optional[str] = None,
+        **kwargs,
+    ) -> None:
+        if query_id:
+            query_id = f"{query_id}-{part}"
+
+        rows = batches = 0
+        try:
+            async with semaphore:
+                batch = []
+                async for row in self._iterate(query, query_id, **kwargs):
+                    batch.append(row)
+                    if len(batch) < batch_size:
+                        continue
+
+                    await queue.put(ExportBatch(part, batch))
+                    rows += len(batch)
+                    batches += 1
+                    batch = []
+                    if progress:
+                        progress(PartProgress(part, rows, batches, False))
+
+                if batch:
+                    await queue.put(ExportBatch(part, batch))
+                    rows += len(batch)
+                    batches += 1
+        except Exception as e:
+            await queue.put(_PartError(part, e))
+            return
+
+        if progress:
+            progress(PartProgress(part, rows, batches, True))
+        await queue.put(_PartDone(part))
+
+    async def parallel_export(
+        self,
+        table: str,
+        filter_params: Optional[dict] = None,
+        split_by: str = None,
+        parts: int = 4,
+        mode: str = "range",
+        fields: Optional[List[str]] = None,
+        ordered: bool = False,
+        concurrency: Optional[int] = None,
+        batch_size: int = 10000,
+        progress: Optional[Callable[[PartProgress], Any]] = None,
+        **kwargs,
+    ) -> AsyncIterator[ExportBatch]:
+
+        assert split_by, "must be use split_by"
+
+        filter_params = filter_params or {}
+        bounds = None
+        if mode == "range":
+            bounds_query = self.sql_builder.select(
+                (self.database, table),
+                filter_params=filter_params,
+                fields=[f"min({split_by})", f"max({split_by})"],
             )
+            low, high = (await self._fetchrow(bounds_query, **kwargs))[:]
+            if low is None:
+                return
+            bounds = range_bounds(low, high, parts)
+
+        queries = [
+            self.sql_builder.select(
+                (self.database, table),
+                filter_params={**filter_params, **part_filter},
+                fields=fields,
+            )
+            for part_filter in part_filters(split_by, parts, mode, bounds)
+        ]
+
+        semaphore = asyncio.Semaphore(concurrency or len(queries))
+        # bounded queues keep memory constant when consumer is slower than parts
+        if ordered:
+            queues = [asyncio.Queue(maxsize=2) for _ in queries]
+        else:
+            queues = [asyncio.Queue(maxsize=2 * len(queries))] * len(queries)
+
+        tasks = [
+            asyncio.ensure_future(
+                self._export_part(
+                    part, query, batch_size, semaphore, queues[part], progress, **kwargs
+                )
+            )
+            for part, query in enumerate(queries)
+        ]
+        try:
+            if ordered:
+                for queue in queues:
+                    async for batch in drain(queue, 1):
+                        yield batch
+            else:
+                async for batch in drain(queues[0], len(queries)):
+                    yield batch
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def export_to_file(
+        self,
+        query: str,
+        target: Union[str, PathLike, BinaryIO],
+        format: str = "TSV",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        settings: Optional[dict] = None,
+        query_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> int:
+
+        deadline = None
+        if timeout is not None:
+            deadline = asyncio.get_event_loop().time() + timeout
 
-        count_query = f"""SELECT count() FROM ({query}) AS c_t"""
+        settings = {**(settings or {})}
+        if query_id:
+            settings["query_id"] = query_id
 
-        return await self.client.fetchval(count_query)
+        # FORMAT on new line, so trailing "-- comment" of query doesn't hide it
+        query = f"{query.strip().rstrip(';')}\nFORMAT {format}"
+
+        size = 0
+        async with self._request(query, settings=settings, timeout=timeout) as resp:
+            with open_target(target) as file:
+                while True:
+                    chunk = await self._read_chunk(resp, chunk_size, deadline)
+                    if not chunk:
+                        break
+                    await write_chunk(file, chunk)
+                    size += len(chunk)
+
+        return size
+
+    async def import_from_file(
+        self,
+        table: str,
+        source: FileSource,
+        format: str = "TSV",
+        fields: Optional[List[str]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        settings: Optional[dict] = None,
+        query_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> Optional[int]:
+
+        settings = {**(settings or {})}
+        if query_id:
+            settings["query_id"] = query_id
+
+        query = f"INSERT INTO {self.database}.{table}"
+        if fields:
+            query += f" ({', '.join(fields)})"
+        query += f" FORMAT {format}"
+
+        async with self._request(
+            query, data=read_chunks(source, chunk_size), settings=settings, timeout=timeout
+        ) as resp:
+            return written_rows(resp.headers.get("X-ClickHouse-Summary"))
+
+    def batch(self, concurrency: int = 10, fuse: bool = True, max_fused: int = 50) -> QueryBatch:
+        return QueryBatch(self, concurrency, fuse, max_fused)
 
     async def raw(self, query: str, command: str = "fetch", **kwargs) -> Any:
 
@@ -226,6 +1150,9 @@ class ChExecutorClient(AbstractChExecutorClient):
 
         assert command in commands, "it isn't accepted command"
 
-        method = getattr(self.client, command)
+        method = getattr(self, f"_{command}")
+
+        if command == "iterate":
+            return method(query, **kwargs)
 
-        return await method(query)
+        return await method(query, **kwargs)
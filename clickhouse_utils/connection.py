@@ -0,0 +1,90 @@
+from typing import Dict, Optional
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+try:
+    import aiodns
+    from aiohttp import AsyncResolver
+except ImportError:  # pragma: no cover
+    aiodns = None
+
+
+class ConnectionSettings(object):
+    """
+    Settings of connection pool for session which is owned by client
+
+    Usage:
+
+    settings = ConnectionSettings(limit=50, keepalive_timeout=60)
+    click_house_client = ChExecutorClient.init_client(None, url, user, password, database,
+                                                      connection_settings=settings)
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 60.0,
+        ttl_dns_cache: Optional[int] = 300,
+        use_aiodns: bool = True,
+        connect_timeout: Optional[float] = 10.0,
+        timeout: Optional[float] = None,
+    ):
+        """
+
+        :param limit: max number of connections in pool, 0 - without limit
+        :param limit_per_host: max number of connections to one host, 0 - without limit
+        :param keepalive_timeout: seconds for keep idle connection open
+        :param ttl_dns_cache: seconds for cache of resolved addresses, None - forever
+        :param use_aiodns: resolve addresses with aiodns if it is installed
+        :param connect_timeout: timeout of connection in seconds
+        :param timeout: total timeout of request in seconds, None - without timeout
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.use_aiodns = use_aiodns
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+
+    def make_connector(self) -> TCPConnector:
+        resolver = None
+        if self.use_aiodns and aiodns is not None:
+            resolver = AsyncResolver()
+
+        return TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.ttl_dns_cache,
+            resolver=resolver,
+        )
+
+    def make_session(self) -> ClientSession:
+        """ Must be called inside running event loop """
+        timeout = ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+        return ClientSession(connector=self.make_connector(), timeout=timeout)
+
+
+def pool_stats(session: ClientSession) -> Dict[str, int]:
+    """
+    Utilization of connection pool of session
+
+    :param session: aiohttp session
+    :return: limits, number of connections in use and idle connections
+    """
+    connector = session.connector
+    if connector is None:
+        return {"limit": 0, "limit_per_host": 0, "acquired": 0, "idle": 0}
+
+    # aiohttp doesn't have public API for pool state
+    acquired = len(getattr(connector, "_acquired", ()))
+    idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+    return {
+        "limit": connector.limit,
+        "limit_per_host": connector.limit_per_host,
+        "acquired": acquired,
+        "idle": idle,
+    }
@@ -0,0 +1,17 @@
+from typing import Union
+
+from aiochclient.exceptions import ChClientError
+
+
+class InsertError(ChClientError):
+    """
+    Raised when some blocks of insert weren't written after all retries.
+
+    Attribute results contains outcome for each block, failed blocks can be re-sent
+    with the same deduplication tokens. For ShardedWriter it is dict with results
+    of blocks or exception for each shard
+    """
+
+    def __init__(self, message: str, results: Union[list, dict]):
+        super().__init__(message)
+        self.results = results
@@ -0,0 +1,100 @@
+import asyncio
+import datetime as dt
+from typing import Any, AsyncIterator, List, NamedTuple, Optional
+
+from aiochclient.records import Record
+
+
+SPLIT_MODES = ["range", "hash"]
+
+
+class ExportBatch(NamedTuple):
+    part: int
+    rows: List[Record]
+
+
+class PartProgress(NamedTuple):
+    part: int
+    rows: int
+    batches: int
+    done: bool
+
+
+class _PartDone(NamedTuple):
+    part: int
+
+
+class _PartError(NamedTuple):
+    part: int
+    error: BaseException
+
+
+def range_bounds(low: Any, high: Any, parts: int) -> List[Any]:
+    """
+    Split [low, high] on parts with equal width
+
+    :param low: min value of key - number, date or datetime
+    :param high: max value of key
+    :param parts: number of parts
+    :return: sorted unique bounds, first is low and last is high
+    """
+    if isinstance(low, float) or isinstance(high, float):
+        points = [low + (high - low) * i / parts for i in range(parts)]
+    elif isinstance(low, dt.date) and not isinstance(low, dt.datetime):
+        points = [low + dt.timedelta(days=(high - low).days * i // parts) for i in range(parts)]
+    else:
+        points = [low + (high - low) * i // parts for i in range(parts)]
+
+    bounds = []
+    for point in points + [high]:
+        if not bounds or point > bounds[-1]:
+            bounds.append(point)
+    return bounds
+
+
+def part_filters(
+    split_by: str, parts: int, mode: str = "range", bounds: Optional[List[Any]] = None
+) -> List[dict]:
+    """
+    Conditions for each part, they are added to filter_params of export
+
+    Key is wrapped in brackets, so conditions don't replace user conditions by the same field
+
+    :param split_by: field or expression for split
+    :param parts: number of parts for hash mode
+    :param mode: "range" - by bounds of key, "hash" - by cityHash64(key) % parts
+    :param bounds: result of range_bounds for range mode
+    :return: filter params for each part
+    """
+    assert mode in SPLIT_MODES, "it isn't accepted split mode"
+
+    if mode == "hash":
+        return [{f"cityHash64({split_by}) % {parts}": part} for part in range(parts)]
+
+    key = f"({split_by})"
+    if len(bounds) == 1:
+        return [{key: bounds[0]}]
+
+    filters = []
+    for index, (low, high) in enumerate(zip(bounds, bounds[1:])):
+        last = index == len(bounds) - 2
+        filters.append({f"{key}__gte": low, f"{key}__lte" if last else f"{key}__lt": high})
+    return filters
+
+
+async def drain(queue: asyncio.Queue, parts: int) -> AsyncIterator[ExportBatch]:
+    """
+    Yield batches from queue until all parts are done
+
+    :param queue: queue with batches of parts
+    :param parts: number of parts which write in queue
+    :return: batches
+    """
+    while parts:
+        item = await queue.get()
+        if isinstance(item, _PartError):
+            raise item.error
+        if isinstance(item, _PartDone):
+            parts -= 1
+            continue
+        yield item
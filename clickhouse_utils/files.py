@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+from contextlib import contextmanager, suppress
+from typing import Any, AsyncIterator, BinaryIO, Iterator, Optional, Union
+
+FileSource = Union[str, os.PathLike, BinaryIO, bytes, bytearray, memoryview, Any]
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+@contextmanager
+def open_target(target: Union[str, os.PathLike, BinaryIO]) -> Iterator[BinaryIO]:
+    """
+    :param target: path or file-like object with write method
+    :return: opened file, file-like object isn't closed, file by path is removed on error
+    """
+    if hasattr(target, "write"):
+        yield target
+        return
+
+    try:
+        with open(target, "wb") as file:
+            yield file
+    except BaseException:
+        # partial result of failed export isn't left
+        with suppress(OSError):
+            os.remove(target)
+        raise
+
+
+async def write_chunk(file: BinaryIO, chunk: bytes) -> None:
+    """ Write in thread pool, so disk doesn't block event loop """
+    await asyncio.get_event_loop().run_in_executor(None, file.write, chunk)
+
+
+async def read_chunks(
+    source: FileSource, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Read source by chunks without loading it in memory
+
+    :param source: path, file-like object with read method or object with buffer
+        protocol (bytes, mmap.mmap)
+    :param chunk_size: size of chunk in bytes
+    :return: chunks
+    """
+    loop = asyncio.get_event_loop()
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            async for chunk in read_chunks(file, chunk_size):
+                yield chunk
+        return
+
+    if hasattr(source, "read"):
+        while True:
+            # reads from disk are in thread pool, so they don't block event loop
+            chunk = await loop.run_in_executor(None, source.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    if isinstance(source, (bytes, bytearray)):
+        for start in range(0, len(source), chunk_size):
+            yield source[start : start + chunk_size]
+        return
+
+    view = memoryview(source)
+    for start in range(0, len(view), chunk_size):
+        # only current chunk is copied, mmap pages are read on demand in thread pool
+        yield await loop.run_in_executor(None, bytes, view[start : start + chunk_size])
+
+
+def written_rows(summary: Optional[str]) -> Optional[int]:
+    """
+    :param summary: value of X-ClickHouse-Summary header
+    :return: number of written rows or None if there is no header
+    """
+    if not summary:
+        return None
+    return int(json.loads(summary).get("written_rows", 0))
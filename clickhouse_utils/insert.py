@@ -0,0 +1,134 @@
+import hashlib
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+
+class InsertBlockResult(NamedTuple):
+    index: int
+    rows: int
+    token: Optional[str]
+    attempts: int
+    error: Optional[BaseException] = None
+    flushed: bool = True
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class AsyncInsertSettings(object):
+    """
+    Server-side buffering of inserts (async_insert). ClickHouse accumulate small inserts
+    in memory and flush them into table by size or by timeout
+
+    Usage:
+
+    settings = AsyncInsertSettings(wait_for_async_insert=False, busy_timeout_ms=200)
+    await click_house_client.create("table", values, async_insert=settings)
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        wait_for_async_insert: bool = True,
+        busy_timeout_ms: Optional[int] = None,
+        max_data_size: Optional[int] = None,
+    ):
+        """
+
+        :param enabled: use async_insert
+        :param wait_for_async_insert: wait until buffer is flushed into table
+        :param busy_timeout_ms: max time in ms before flush of buffer
+        :param max_data_size: max size in bytes of buffer before flush
+        """
+        self.enabled = enabled
+        self.wait_for_async_insert = wait_for_async_insert
+        self.busy_timeout_ms = busy_timeout_ms
+        self.max_data_size = max_data_size
+
+    @property
+    def flushed(self) -> bool:
+        """ Successful insert means that data is written in table """
+        return not self.enabled or self.wait_for_async_insert
+
+    def to_settings(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {}
+
+        settings = {
+            "async_insert": 1,
+            "wait_for_async_insert": int(self.wait_for_async_insert),
+        }
+        if self.busy_timeout_ms is not None:
+            settings["async_insert_busy_timeout_ms"] = self.busy_timeout_ms
+        if self.max_data_size is not None:
+            settings["async_insert_max_data_size"] = self.max_data_size
+        return settings
+
+
+class InsertMetrics(object):
+    """
+    Counters of insert blocks and rows.
+
+    acknowledged - accepted by ClickHouse, flushed - written in table.
+    Without async_insert or with wait_for_async_insert each acknowledged write is flushed
+    """
+
+    __slots__ = (
+        "acknowledged_blocks",
+        "acknowledged_rows",
+        "flushed_blocks",
+        "flushed_rows",
+        "failed_blocks",
+        "failed_rows",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def add(self, result: InsertBlockResult) -> None:
+        if not result.ok:
+            self.failed_blocks += 1
+            self.failed_rows += result.rows
+            return
+
+        self.acknowledged_blocks += 1
+        self.acknowledged_rows += result.rows
+        if result.flushed:
+            self.flushed_blocks += 1
+            self.flushed_rows += result.rows
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def split_blocks(values: List[tuple], block_size: Optional[int] = None) -> Iterator[List[tuple]]:
+    """
+    Split values on blocks, each block will be sent in separate INSERT
+
+    :param values: rows for insert
+    :param block_size: max rows in one block, None - all rows in one block
+    :return: blocks of rows
+    """
+    if not block_size or block_size >= len(values):
+        yield values
+        return
+
+    for start in range(0, len(values), block_size):
+        yield values[start : start + block_size]
+
+
+def block_token(query: str, index: int, token: Optional[str] = None) -> str:
+    """
+    Stable insert_deduplication_token for block. ClickHouse skip block with token
+    which was already inserted, so the same block can be safely sent again
+
+    :param query: complete INSERT query of block
+    :param index: number of block in insert
+    :param token: token from caller, number of block will be added to it
+    :return: deduplication token
+    """
+    if token is not None:
+        return f"{token}_{index}"
+
+    return hashlib.sha256(query.encode()).hexdigest()
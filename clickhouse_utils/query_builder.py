@@ -1,4 +1,5 @@
 from typing import Optional, List, Dict, Any, Tuple, Union
+from clickhouse_utils.sql.aggregates import find_aggregate
 from clickhouse_utils.sql.operators import OPERATORS
 from clickhouse_utils.sql.mapper import py2ch, rows2ch
 
@@ -14,10 +15,17 @@ class SQLBuilder(object):
         pagination: Optional[dict] = None,
         fields: Optional[List[str]] = None,
         ordering: Optional[List[str]] = None,
+        aggregations: Optional[Dict[str, Union[str, tuple]]] = None,
+        group_by: Optional[List[str]] = None,
+        having: Optional[dict] = None,
+        with_totals: bool = False,
+        prewhere_params: Optional[dict] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
     ):
         """
 
-        :param action: can be "select" or "insert"
+        :param action: can be "select", "insert", "aggregate" or "count"
         :param table: name of table in database
         :param db: name database in clickhouse
         :param values: data which insert in table
@@ -25,6 +33,13 @@ class SQLBuilder(object):
         :param pagination: settings for pagination LIMIT OFFSET
         :param fields: name fields which use in select
         :param ordering: ORDER_BY settings
+        :param aggregations: aggregate functions. Key - alias, Value - field name and function
+        :param group_by: GROUP BY fields
+        :param having: conditions for "having" block, keys are aliases or group_by fields
+        :param with_totals: add WITH TOTALS modifier
+        :param prewhere_params: conditions for "prewhere" block, same syntax as filter_params
+        :param sample: SAMPLE clause, part of data (0.1) or number of rows (1000000)
+        :param final: add FINAL modifier for merge rows of ReplacingMergeTree and other engines
         """
         self.values = values
         self.filter_params = filter_params
@@ -34,6 +49,13 @@ class SQLBuilder(object):
         self.action = action
         self.table = table
         self.db = db
+        self.aggregations = aggregations
+        self.group_by = group_by
+        self.having = having
+        self.with_totals = with_totals
+        self.prewhere_params = prewhere_params
+        self.sample = sample
+        self.final = final
 
     @staticmethod
     def _prepare_query_params(
@@ -54,7 +76,7 @@ class SQLBuilder(object):
         return prepared_query_params
 
     @staticmethod
-    def where_sting(filter_values: dict) -> str:
+    def conditions_string(filter_values: dict) -> str:
         """
         Support next operators:
          exact - =
@@ -64,10 +86,8 @@ class SQLBuilder(object):
          gte - >=
 
         :param filter_values: dict with conditions. Key - field name and operator, Value - condition
-        :return: complete condition string
+        :return: conditions joined by "and"
         """
-        if not filter_values:
-            return ""
 
         conditions = []
         for key, value in filter_values.items():
@@ -81,9 +101,107 @@ class SQLBuilder(object):
 
             conditions.append(OPERATORS[operator].to_sql(field_name, value))
 
-        where_str = " and ".join(conditions)
+        return " and ".join(conditions)
+
+    @classmethod
+    def where_sting(cls, filter_values: dict) -> str:
+        """
+        :param filter_values: dict with conditions. Key - field name and operator, Value - condition
+        :return: complete condition string
+        """
+        if not filter_values:
+            return ""
+
+        where_str = cls.conditions_string(filter_values)
         return f"WHERE {where_str}"
 
+    @classmethod
+    def having_string(cls, having: dict) -> str:
+        """
+        :param having: dict with conditions by aliases of aggregations, same syntax as filter_params
+        :return: complete HAVING string
+        """
+        if not having:
+            return ""
+
+        having_str = cls.conditions_string(having)
+        return f"HAVING {having_str}"
+
+    @staticmethod
+    def split_prewhere(
+        filter_values: Optional[dict], column_sizes: Dict[str, int]
+    ) -> Tuple[Optional[dict], Optional[dict]]:
+        """
+        Move conditions by the narrowest column to PREWHERE, ClickHouse read other columns
+        only for rows which satisfy them
+
+        :param filter_values: dict with conditions
+        :param column_sizes: compressed size of columns in bytes
+        :return: prewhere conditions and where conditions
+        """
+        if not filter_values:
+            return None, filter_values
+
+        fields = {key: key.split("__")[0] for key in filter_values}
+        known = [field for field in fields.values() if field in column_sizes]
+        if not known:
+            return None, filter_values
+
+        narrowest = min(known, key=lambda field: column_sizes[field])
+
+        prewhere = {}
+        where = {}
+        for key, value in filter_values.items():
+            if fields[key] == narrowest:
+                prewhere[key] = value
+            else:
+                where[key] = value
+        return prewhere, where or None
+
+    def _from_string(self) -> str:
+        from_string = f"FROM {self.db}.{self.table}"
+        if self.final:
+            from_string += " FINAL"
+        if self.sample is not None:
+            from_string += f" SAMPLE {self.sample}"
+        if self.prewhere_params:
+            from_string += f" PREWHERE {self.conditions_string(self.prewhere_params)}"
+        return from_string
+
+    @staticmethod
+    def parse_aggregation(
+        aggregation: Union[str, tuple]
+    ) -> Tuple[Optional[str], str, Optional[list]]:
+        """
+        Aggregation is "field__function" or "function" (count()),
+        parametric functions use tuple ("field__function", params)
+
+        :param aggregation: field name and function
+        :return: field name, function and params
+        """
+        params = None
+        if isinstance(aggregation, tuple):
+            aggregation, params = aggregation
+
+        splited = aggregation.split("__")
+        if len(splited) < 2:
+            return None, splited[0], params
+        return splited[0], splited[1], params
+
+    @classmethod
+    def aggregation_string(cls, alias: str, aggregation: Union[str, tuple]) -> str:
+        """
+        Support functions from clickhouse_utils.sql.aggregates and their -State and -Merge
+        combinators ("amount__sumState")
+
+        :param alias: name of result column
+        :param aggregation: field name and function, see parse_aggregation
+        :return: aggregate expression with alias
+        """
+        field_name, function, params = cls.parse_aggregation(aggregation)
+
+        return f"{find_aggregate(function).to_sql(field_name, params)} AS {alias}"
+
     @staticmethod
     def ordering_string(ordering: List[str]) -> str:
         ordering_list = []
@@ -108,6 +226,57 @@ class SQLBuilder(object):
 
         return f"INSERT INTO {self.db}.{self.table} VALUES {val_str}"
 
+    def _pagination_string(self) -> str:
+        if not self.pagination:
+            return ""
+
+        limit = self.pagination.get("limit", 100)
+        offset = self.pagination.get("offset", 0)
+        return f"LIMIT {limit} OFFSET {offset}"
+
+    def _make_aggregate_query(self):
+        select_list = list(self.group_by or [])
+        select_list.extend(
+            self.aggregation_string(alias, aggregation)
+            for alias, aggregation in self.aggregations.items()
+        )
+
+        if self.group_by:
+            group_by_string = "GROUP BY " + ", ".join(self.group_by)
+            if self.with_totals:
+                group_by_string += " WITH TOTALS"
+        else:
+            group_by_string = ""
+
+        result = filter(
+            lambda item: item,
+            [
+                f"SELECT {', '.join(select_list)} {self._from_string()}",
+                self.where_sting(self.filter_params),
+                group_by_string,
+                self.having_string(self.having),
+                self.ordering_string(self.ordering) if self.ordering else "",
+                self._pagination_string(),
+            ],
+        )
+        return " ".join(result)
+
+    def _make_count_query(self):
+        if self.sample is not None:
+            # each sampled row stands for _sample_factor rows of table
+            count_string = "SELECT toUInt64(round(sum(_sample_factor)))"
+        else:
+            count_string = "SELECT count()"
+
+        result = filter(
+            lambda item: item,
+            [
+                f"{count_string} {self._from_string()}",
+                self.where_sting(self.filter_params),
+            ],
+        )
+        return " ".join(result)
+
     def _make_select_query(self):
         where_string = self.where_sting(self.filter_params)
 
@@ -118,12 +287,7 @@ class SQLBuilder(object):
 
         select_str = f"SELECT {fields_string}"
 
-        if self.pagination:
-            limit = self.pagination.get("limit", 100)
-            offset = self.pagination.get("offset", 0)
-            pagination_string = f"LIMIT {limit} OFFSET {offset}"
-        else:
-            pagination_string = ""
+        pagination_string = self._pagination_string()
 
         if self.ordering:
             ordering_string = self.ordering_string(self.ordering)
@@ -133,7 +297,7 @@ class SQLBuilder(object):
         result = filter(
             lambda item: item,
             [
-                f"{select_str} FROM {self.db}.{self.table}",
+                f"{select_str} {self._from_string()}",
                 where_string,
                 ordering_string,
                 pagination_string,
@@ -147,7 +311,12 @@ class BaseSQLBuilder(SQLBuilder):
     Usage
 
     select_query = BaseSQLBuilder.select(destination, filter_params, pagination, fields, ordering)
+    sample_query = BaseSQLBuilder.select(destination, filter_params, sample=0.1, final=True)
     insert_query = BaseSQLBuilder.insert(destination, values)
+    aggregate_query = BaseSQLBuilder.aggregate(
+        destination, {"total": "amount__sum"}, filter_params, group_by=["user_id"]
+    )
+    count_query = BaseSQLBuilder.count(destination, filter_params)
     """
 
     @classmethod
@@ -170,9 +339,13 @@ class BaseSQLBuilder(SQLBuilder):
         pagination: Optional[dict] = None,
         fields: Optional[List[str]] = None,
         ordering: Optional[List[str]] = None,
+        prewhere_params: Optional[dict] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
     ) -> str:
         action = "select"
         filter_params = cls._prepare_query_params(filter_params)
+        prewhere_params = cls._prepare_query_params(prewhere_params)
         return cls(
             action,
             destination[1],
@@ -181,4 +354,66 @@ class BaseSQLBuilder(SQLBuilder):
             pagination=pagination,
             fields=fields,
             ordering=ordering,
+            prewhere_params=prewhere_params,
+            sample=sample,
+            final=final,
+        )._build()
+
+    @classmethod
+    def aggregate(
+        cls,
+        destination: Tuple[str, str],
+        aggregations: Dict[str, Union[str, tuple]],
+        filter_params: Optional[dict] = None,
+        group_by: Optional[List[str]] = None,
+        having: Optional[dict] = None,
+        ordering: Optional[List[str]] = None,
+        pagination: Optional[dict] = None,
+        with_totals: bool = False,
+        prewhere_params: Optional[dict] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+    ) -> str:
+        assert group_by or not with_totals, "with_totals must be used with group_by"
+
+        action = "aggregate"
+        filter_params = cls._prepare_query_params(filter_params)
+        prewhere_params = cls._prepare_query_params(prewhere_params)
+        having = cls._prepare_query_params(having)
+        return cls(
+            action,
+            destination[1],
+            destination[0],
+            filter_params=filter_params,
+            pagination=pagination,
+            ordering=ordering,
+            aggregations=aggregations,
+            group_by=group_by,
+            having=having,
+            with_totals=with_totals,
+            prewhere_params=prewhere_params,
+            sample=sample,
+            final=final,
+        )._build()
+
+    @classmethod
+    def count(
+        cls,
+        destination: Tuple[str, str],
+        filter_params: Optional[dict] = None,
+        prewhere_params: Optional[dict] = None,
+        sample: Optional[Union[int, float, str]] = None,
+        final: bool = False,
+    ) -> str:
+        action = "count"
+        filter_params = cls._prepare_query_params(filter_params)
+        prewhere_params = cls._prepare_query_params(prewhere_params)
+        return cls(
+            action,
+            destination[1],
+            destination[0],
+            filter_params=filter_params,
+            prewhere_params=prewhere_params,
+            sample=sample,
+            final=final,
         )._build()
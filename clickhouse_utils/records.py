@@ -0,0 +1,93 @@
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Union
+
+from clickhouse_utils.sql.mapper import what_py_converter
+
+
+_NOT_DECODED = object()
+
+
+@lru_cache(maxsize=None)
+def cached_converter(name: str) -> Callable:
+    """ Converter for ClickHouse type, type name is parsed once """
+    return what_py_converter(name)
+
+
+class LazyRecord(Mapping):
+    """
+    Row which keep raw bytes of response and decode cell on first access.
+    Decoded value is memoized, so decode cost depends on number of read cells
+
+    Usage:
+
+    row = await click_house_client.get_object("table", lazy=True)
+
+    assert row["a"] == 1
+    assert row[0] == 1
+    assert row[:] == (1, (dt.date(2018, 9, 8), 3.14))
+    """
+
+    __slots__ = ("_row", "_cells", "_values", "_names", "_converters")
+
+    def __init__(self, row: bytes, names: Dict[str, int], converters: List[Callable]):
+        self._row = row
+        self._cells = None
+        if not row:
+            # in case of empty row, it is separator of WITH TOTALS
+            self._names = {}
+            self._converters = []
+        else:
+            self._names = names
+            self._converters = converters
+
+    def _cell(self, index: int) -> Any:
+        if self._cells is None:
+            self._cells = self._row.split(b"\t") if self._row else []
+            self._values = [_NOT_DECODED] * len(self._cells)
+
+        value = self._values[index]
+        if value is _NOT_DECODED:
+            value = self._converters[index](self._cells[index])
+            self._values[index] = value
+        return value
+
+    def __getitem__(self, key: Union[str, int, slice]) -> Any:
+        if type(key) == str:
+            try:
+                index = self._names[key]
+            except KeyError:
+                raise KeyError(f"No fields with name '{key}'")
+            return self._cell(index)
+
+        if type(key) == slice:
+            return tuple(self._cell(index) for index in range(len(self._names))[key])
+
+        if not -len(self._names) <= key < len(self._names):
+            raise IndexError(f"No fields with index '{key}'")
+        return self._cell(key % len(self._names))
+
+    def __iter__(self) -> Iterator:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class LazyRecordsFabric(object):
+
+    __slots__ = ("converters", "names")
+
+    def __init__(self, tps: bytes, names: bytes):
+        names = names.decode().strip().split("\t")
+        self.names = {key: index for (index, key) in enumerate(names)}
+        self.converters = [
+            cached_converter(tp) for tp in tps.decode().strip().split("\t")
+        ]
+
+    def new(self, row: bytes) -> LazyRecord:
+        return LazyRecord(
+            row=row[:-1],  # because of delimiter
+            names=self.names,
+            converters=self.converters,
+        )
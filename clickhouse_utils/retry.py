@@ -0,0 +1,56 @@
+import asyncio
+import random
+from typing import Tuple, Type
+
+from aiohttp import ClientError
+
+
+class RetryPolicy(object):
+    """
+    Usage:
+
+    policy = RetryPolicy(attempts=5, base_delay=0.2)
+    await asyncio.sleep(policy.delay(attempt))
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 5.0,
+        jitter: bool = True,
+        retry_on: Tuple[Type[BaseException], ...] = (ClientError, asyncio.TimeoutError),
+    ):
+        """
+
+        :param attempts: max number of attempts, 1 - without retry
+        :param base_delay: delay in seconds before second attempt
+        :param max_delay: upper bound of delay in seconds
+        :param jitter: use random delay from 0 to exponential delay (full jitter)
+        :param retry_on: exceptions which can be retried
+        """
+        assert attempts >= 1, "attempts must be greater than 0"
+
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_on = retry_on
+
+    def delay(self, attempt: int) -> float:
+        """
+        Exponential backoff delay after failed attempt
+
+        :param attempt: number of failed attempt, start from 1
+        :return: seconds for sleep
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
+
+    def can_retry(self, attempt: int, error: BaseException) -> bool:
+        return attempt < self.attempts and isinstance(error, self.retry_on)
+
+
+NO_RETRY = RetryPolicy(attempts=1)
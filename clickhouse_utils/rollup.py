@@ -0,0 +1,353 @@
+import asyncio
+import operator
+import os
+import pickle
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+
+from clickhouse_utils.query_builder import BaseSQLBuilder
+
+if TYPE_CHECKING:
+    from clickhouse_utils.client import AbstractChExecutorClient
+
+
+# partial aggregates which are computed by ClickHouse for new rows and merged on client
+PARTIALS = {
+    "count": ["count"],
+    "sum": ["sum"],
+    "min": ["min"],
+    "max": ["max"],
+    "avg": ["sum", "count"],
+}
+
+
+def skip_none(merge: Callable[[Any, Any], Any]) -> Callable[[Any, Any], Any]:
+    """ Partial value of Nullable column is NULL, if all values of group are NULL """
+
+    def merged(old: Any, new: Any) -> Any:
+        if old is None:
+            return new
+        if new is None:
+            return old
+        return merge(old, new)
+
+    return merged
+
+
+MERGES = {
+    "count": skip_none(operator.add),
+    "sum": skip_none(operator.add),
+    "min": skip_none(min),
+    "max": skip_none(max),
+}
+
+FINALS = {
+    "avg": lambda total, count: total / count if count else None,
+}
+
+
+class RollupStore(object):
+    """ Storage of aggregated rows and watermark of Rollup """
+
+    watermark = None
+
+    async def load(self, rollup: "Rollup") -> None:
+        """ Restore watermark and aggregated rows """
+        raise NotImplementedError
+
+    async def merge(self, rollup: "Rollup", filter_params: dict, watermark: Any) -> None:
+        """
+        Aggregate rows of source table which match filter_params and merge them in store
+
+        :param rollup: rollup with client, source table and aggregations
+        :param filter_params: conditions of new rows, range of watermark column is included
+        :param watermark: new watermark, it is saved with merged rows
+        """
+        raise NotImplementedError
+
+    async def fetch(self, rollup: "Rollup") -> List[dict]:
+        """ Aggregated rows, group_by fields and aliases of aggregations """
+        raise NotImplementedError
+
+
+class MemoryStore(RollupStore):
+    """
+    Partial aggregates in memory. Support count, sum, min, max and avg, which are
+    merged from partial sum and count. With path state is saved in file after each refresh
+    """
+
+    def __init__(self, path: Optional[Union[str, os.PathLike]] = None):
+        """
+
+        :param path: file for state between restarts, None - state only in memory
+        """
+        self.path = path
+        self.watermark = None
+        self.groups = {}
+
+    @staticmethod
+    def partials(rollup: "Rollup") -> Dict[str, Union[str, tuple]]:
+        """ Aggregations of partial values, alias "_{alias}_{function}" """
+        partials = {}
+        for alias, aggregation in rollup.aggregations.items():
+            field_name, function, params = BaseSQLBuilder.parse_aggregation(aggregation)
+            assert function in PARTIALS, f"{function} can't be merged in memory, use TableStore"
+            for partial in PARTIALS[function]:
+                partial_aggregation = f"{field_name}__{partial}" if field_name else partial
+                partials[f"_{alias}_{partial}"] = partial_aggregation
+        return partials
+
+    async def load(self, rollup: "Rollup") -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb") as file:
+            self.watermark, self.groups = pickle.load(file)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+
+        # state is replaced atomically, file isn't broken if process is killed
+        tmp_path = f"{os.fspath(self.path)}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump((self.watermark, self.groups), file)
+        os.replace(tmp_path, self.path)
+
+    async def merge(self, rollup: "Rollup", filter_params: dict, watermark: Any) -> None:
+        partials = self.partials(rollup)
+        functions = [
+            BaseSQLBuilder.parse_aggregation(aggregation)[1] for aggregation in partials.values()
+        ]
+
+        rows = await rollup.client.get_aggregate(
+            rollup.table, partials, filter_params, group_by=rollup.group_by
+        )
+
+        for row in rows:
+            key = tuple(row[field] for field in rollup.group_by)
+            values = [row[alias] for alias in partials]
+            state = self.groups.get(key)
+            if state is None:
+                self.groups[key] = values
+            else:
+                self.groups[key] = [
+                    MERGES[function](old, new)
+                    for function, old, new in zip(functions, state, values)
+                ]
+
+        self.watermark = watermark
+        self.save()
+
+    async def fetch(self, rollup: "Rollup") -> List[dict]:
+        result = []
+        for key, state in self.groups.items():
+            item = dict(zip(rollup.group_by, key))
+            index = 0
+            for alias, aggregation in rollup.aggregations.items():
+                _, function, _ = BaseSQLBuilder.parse_aggregation(aggregation)
+                size = len(PARTIALS[function])
+                values = state[index : index + size]
+                index += size
+                item[alias] = FINALS[function](*values) if function in FINALS else values[0]
+            result.append(item)
+        return result
+
+
+class TableStore(RollupStore):
+    """
+    Intermediate states in ClickHouse table of AggregatingMergeTree engine,
+    any aggregate function can be used. New rows are inserted by INSERT SELECT with
+    -State functions, reads use -Merge functions, so data isn't transferred to client.
+
+    Table for aggregations {"total": "amount__sum", "users": "user_id__uniq"}
+    with group_by ["country"] and watermark column ts:
+
+    CREATE TABLE events_rollup (
+        country String,
+        total AggregateFunction(sum, UInt64),
+        users AggregateFunction(uniq, UInt64),
+        _watermark SimpleAggregateFunction(max, DateTime)
+    ) ENGINE = AggregatingMergeTree() ORDER BY country
+
+    Insert of each watermark range has insert_deduplication_token, it works for
+    Replicated tables or with non_replicated_deduplication_window setting
+    """
+
+    def __init__(self, table: str, watermark_column: str = "_watermark"):
+        """
+
+        :param table: name of target table in database of client
+        :param watermark_column: column of target table with max value of watermark column
+        """
+        self.table = table
+        self.watermark_column = watermark_column
+        self.watermark = None
+
+    async def load(self, rollup: "Rollup") -> None:
+        query = rollup.client.sql_builder.aggregate(
+            (rollup.client.database, self.table),
+            {"watermark": f"{self.watermark_column}__max", "rows": "count"},
+        )
+        row = await rollup.client.raw(query, "fetchrow")
+        if row and row["rows"]:
+            self.watermark = row["watermark"]
+
+    async def merge(self, rollup: "Rollup", filter_params: dict, watermark: Any) -> None:
+        states = {}
+        for alias, aggregation in rollup.aggregations.items():
+            field_name, function, params = BaseSQLBuilder.parse_aggregation(aggregation)
+            state = f"{field_name}__{function}State" if field_name else f"{function}State"
+            states[alias] = (state, params)
+        states[self.watermark_column] = f"{rollup.watermark}__max"
+
+        select_query = rollup.client.sql_builder.aggregate(
+            (rollup.client.database, rollup.table),
+            states,
+            filter_params=filter_params,
+            group_by=rollup.group_by,
+        )
+        fields = ", ".join([*rollup.group_by, *states])
+        # the same range of watermark isn't inserted twice, if insert is committed
+        # by server after error on client and it is repeated
+        token = f"{rollup.table}:{self.watermark}:{watermark}"
+        await rollup.client.raw(
+            f"INSERT INTO {rollup.client.database}.{self.table} ({fields}) {select_query}",
+            "execute",
+            settings={"insert_deduplication_token": token},
+        )
+        self.watermark = watermark
+
+    async def fetch(self, rollup: "Rollup") -> List[dict]:
+        merges = {}
+        for alias, aggregation in rollup.aggregations.items():
+            _, function, params = BaseSQLBuilder.parse_aggregation(aggregation)
+            merges[alias] = (f"{alias}__{function}Merge", params)
+
+        records = await rollup.client.get_aggregate(
+            self.table, merges, group_by=rollup.group_by or None
+        )
+        fields = [*rollup.group_by, *merges]
+        return [{field: record[field] for field in fields} for record in records]
+
+
+class Rollup(object):
+    """
+    Cached aggregation of append-only table, refreshed by watermark.
+    Max value of watermark column (time or id) is saved after each refresh,
+    next refresh aggregates only rows after it and merges them in store,
+    so cost of refresh depends on number of new rows, not on size of table.
+
+    Usage:
+
+    rollup = Rollup(
+        click_house_client,
+        "events",
+        {"n": "count", "total": "amount__sum", "avg_amount": "amount__avg"},
+        watermark="id",
+        group_by=["country"],
+        store=MemoryStore("events_rollup.pickle"),
+    )
+    rows = await rollup.fetch(refresh=True)
+
+    Rows with value of watermark column less or equal to saved watermark, which are
+    inserted after refresh, aren't counted. For time column use lag - rows of the last
+    lag seconds are aggregated by next refresh, when late rows are arrived
+    """
+
+    def __init__(
+        self,
+        client: "AbstractChExecutorClient",
+        table: str,
+        aggregations: Dict[str, Union[str, tuple]],
+        watermark: str,
+        group_by: Optional[List[str]] = None,
+        filter_params: Optional[dict] = None,
+        store: Optional[RollupStore] = None,
+        lag: Any = None,
+    ):
+        """
+
+        :param client: client for queries to ClickHouse
+        :param table: source table in database of client
+        :param aggregations: aggregate functions. Key - alias, Value - field name and function,
+            the same as in get_aggregate
+        :param watermark: column which value grows with inserts, time or id
+        :param group_by: GROUP BY fields
+        :param filter_params: conditions for rows of source table
+        :param store: storage of aggregated rows, by default MemoryStore without file
+        :param lag: value which is subtracted from max value of watermark column,
+            timedelta for time column, int for id
+        """
+        self.client = client
+        self.table = table
+        self.aggregations = aggregations
+        self.watermark = watermark
+        self.group_by = list(group_by or [])
+        self.filter_params = filter_params or {}
+        self.store = store or MemoryStore()
+        self.lag = lag
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+        if isinstance(self.store, MemoryStore):
+            # check that aggregations can be merged in memory
+            self.store.partials(self)
+
+    async def _load(self) -> None:
+        if not self._loaded:
+            await self.store.load(self)
+            self._loaded = True
+
+    async def refresh(self) -> bool:
+        """
+        Aggregate rows which are inserted after last refresh
+
+        :return: False if there are no new rows
+        """
+        async with self._lock:
+            await self._load()
+
+            # key in brackets doesn't replace condition of caller for the same column
+            key = f"({self.watermark})"
+            filter_params = dict(self.filter_params)
+            if self.store.watermark is not None:
+                filter_params[f"{key}__gt"] = self.store.watermark
+
+            stats = await self.client.get_aggregate(
+                self.table,
+                {"rows": "count", "watermark": f"{self.watermark}__max"},
+                filter_params,
+            )
+            if not stats or not stats[0]["rows"]:
+                return False
+
+            watermark = stats[0]["watermark"]
+            if self.lag is not None:
+                watermark = watermark - self.lag
+            if self.store.watermark is not None and watermark <= self.store.watermark:
+                return False
+
+            filter_params[f"{key}__lte"] = watermark
+            try:
+                await self.store.merge(self, filter_params, watermark)
+            except BaseException:
+                # rows can be merged by server before error on client,
+                # watermark is loaded from store again by next call
+                self._loaded = False
+                raise
+            return True
+
+    async def fetch(self, refresh: bool = False) -> List[dict]:
+        """
+        Aggregated rows from store
+
+        :param refresh: aggregate new rows before read
+        :return: dicts with group_by fields and aliases of aggregations
+        """
+        if refresh:
+            await self.refresh()
+        else:
+            async with self._lock:
+                await self._load()
+
+        return await self.store.fetch(self)
@@ -0,0 +1,143 @@
+import asyncio
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional
+
+from aiohttp import ClientSession
+
+from clickhouse_utils.client import ChExecutorClient
+from clickhouse_utils.exceptions import InsertError
+from clickhouse_utils.insert import InsertBlockResult
+
+
+class ShardedWriter(object):
+    """
+    Insert in local tables of shards directly, without Distributed table.
+    Rows are split on client by the same rule as Distributed engine:
+    shard is chosen by sharding_key(row) % sum(weights) and ranges of weights
+
+    Usage:
+
+    writer = ShardedWriter.init_writer(
+        session,
+        ["http://shard1:8123", "http://shard2:8123"],
+        user,
+        password,
+        database,
+        sharding_key=lambda row: row[0],  # the same as sharding expression of Distributed table
+    )
+    results = await writer.create("events_local", values)
+    """
+
+    def __init__(
+        self,
+        clients: List[ChExecutorClient],
+        sharding_key: Optional[Callable[[tuple], int]] = None,
+        weights: Optional[List[int]] = None,
+    ):
+        """
+
+        :param clients: client for each shard, in order of shards in cluster
+        :param sharding_key: function which return integer key for row,
+            None - rows are distributed evenly like rand()
+        :param weights: weight of each shard, by default 1 for each shard
+        """
+        weights = weights or [1] * len(clients)
+        assert len(weights) == len(clients), "must be weight for each shard"
+
+        self.clients = clients
+        self.sharding_key = sharding_key
+        self.weights = weights
+        self._bounds = list(accumulate(weights))
+        self._counter = 0
+
+    @classmethod
+    def init_writer(
+        cls,
+        session: Optional[ClientSession],
+        urls: List[str],
+        user: str,
+        password: str,
+        database: str,
+        sharding_key: Optional[Callable[[tuple], int]] = None,
+        weights: Optional[List[int]] = None,
+        **kwargs,
+    ):
+        """
+        create writer with client for each shard
+
+        :param session: aiohttp session, it is shared by clients of shards
+        :param urls: address of one replica of each shard
+        :param user: name database user
+        :param password: password for user
+        :param database: database name of local tables
+        :param sharding_key: function which return integer key for row
+        :param weights: weight of each shard
+        :param kwargs: other settings of ChExecutorClient.init_client
+        :return: class instance
+        """
+        clients = [
+            ChExecutorClient.init_client(session, url, user, password, database, **kwargs)
+            for url in urls
+        ]
+        return cls(clients, sharding_key, weights)
+
+    def shard_of(self, key: int) -> int:
+        remainder = key % self._bounds[-1]
+        for shard, bound in enumerate(self._bounds):
+            if remainder < bound:
+                return shard
+
+    def split(self, values: List[tuple]) -> Dict[int, List[tuple]]:
+        """
+        :param values: rows for insert
+        :return: rows of each shard, shards without rows are skipped
+        """
+        shards = {}
+        for row in values:
+            if self.sharding_key is None:
+                key = self._counter
+                self._counter += 1
+            else:
+                key = self.sharding_key(row)
+            shards.setdefault(self.shard_of(key), []).append(row)
+        return shards
+
+    async def create(
+        self, table: str, values: List[tuple], fields: List[str] = None, **kwargs
+    ) -> Dict[int, List[InsertBlockResult]]:
+        """
+        Insert rows in local table of each shard concurrently
+
+        :param table: name of local table on shards
+        :param values: values which will be insert in table
+        :param fields: name fields for insert
+        :param kwargs: other params of ChExecutorClient.create
+        :return: result of blocks for each shard
+        :raise InsertError: if insert in some shards failed, results is dict with
+            results of blocks for each shard or exception of failed shard
+        """
+        shards = self.split(values)
+        results = await asyncio.gather(
+            *(
+                self.clients[shard].create(table, rows, fields, **kwargs)
+                for shard, rows in shards.items()
+            ),
+            return_exceptions=True,
+        )
+
+        results = dict(zip(shards, results))
+
+        # raise after all shards are finished, so other inserts aren't interrupted
+        failed = [
+            result for result in results.values() if isinstance(result, BaseException)
+        ]
+        if failed:
+            raise InsertError(
+                f"insert in {len(failed)} of {len(results)} shards failed", results
+            ) from failed[0]
+
+        return results
+
+    async def close(self) -> None:
+        for client in self.clients:
+            await client.close()
@@ -0,0 +1,64 @@
+from typing import Optional, Sequence
+
+from clickhouse_utils.sql.mapper import py2ch
+
+
+class Aggregate(object):
+    def to_sql(self, field_name: Optional[str] = None, params: Optional[Sequence] = None):
+        raise NotImplementedError
+
+    def combine(self, combinator: str) -> "Aggregate":
+        raise NotImplementedError
+
+
+class SimpleAggregate(Aggregate):
+    def __init__(self, sql_function, parametric=False):
+        self._sql_function = sql_function
+        self._parametric = parametric
+
+    def to_sql(self, field_name=None, params=None):
+        argument = field_name or ""
+
+        if self._parametric and params:
+            params_str = ", ".join(py2ch(param).decode() for param in params)
+            return f"{self._sql_function}({params_str})({argument})"
+
+        return f"{self._sql_function}({argument})"
+
+    def combine(self, combinator):
+        return SimpleAggregate(self._sql_function + combinator, self._parametric)
+
+
+AGGREGATES = {}
+
+# sumState(amount) keeps intermediate state in AggregatingMergeTree, sumMerge(total) reads it
+COMBINATORS = ["State", "Merge"]
+
+
+def register_aggregate(name, aggregate_class: Aggregate):
+    AGGREGATES[name] = aggregate_class
+
+
+def find_aggregate(name: str) -> Aggregate:
+    """ Registered aggregate or registered aggregate with combinator, for example uniqState """
+    if name in AGGREGATES:
+        return AGGREGATES[name]
+
+    for combinator in COMBINATORS:
+        function = name[: -len(combinator)]
+        if name.endswith(combinator) and function in AGGREGATES:
+            return AGGREGATES[function].combine(combinator)
+
+    raise KeyError(name)
+
+
+register_aggregate("count", SimpleAggregate("count"))
+register_aggregate("sum", SimpleAggregate("sum"))
+register_aggregate("avg", SimpleAggregate("avg"))
+register_aggregate("min", SimpleAggregate("min"))
+register_aggregate("max", SimpleAggregate("max"))
+register_aggregate("uniq", SimpleAggregate("uniq"))
+register_aggregate("uniqExact", SimpleAggregate("uniqExact"))
+register_aggregate("quantile", SimpleAggregate("quantile", parametric=True))
+register_aggregate("quantiles", SimpleAggregate("quantiles", parametric=True))
+register_aggregate("groupArray", SimpleAggregate("groupArray", parametric=True))
@@ -0,0 +1,752 @@
+import asyncio
+import csv
+import datetime as dt
+import io
+import json
+import random
+import re
+import uuid
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple, Union
+
+from aiohttp import web
+
+from clickhouse_utils.sql.mapper import StrType, py2ch, what_py_type
+
+# string literals are matched too, so comment inside of string is kept
+RE_COMMENTS = re.compile(r"('(?:[^'\\]|\\.)*')|--[^\n]*|/\*.*?\*/", re.DOTALL)
+RE_FORMAT = re.compile(r"\s+FORMAT\s+(\w+)\s*;?\s*$", re.IGNORECASE)
+RE_INSERT = re.compile(
+    r"^\s*INSERT\s+INTO\s+(?P<table>[\w.]+)\s*(?:\((?P<fields>[^)]*)\))?\s*"
+    r"(?:VALUES\s*(?P<values>.*)|FORMAT\s+(?P<format>\w+)\s*(?P<data>.*))?$",
+    re.IGNORECASE | re.DOTALL,
+)
+RE_INSERT_SELECT = re.compile(
+    r"^\s*INSERT\s+INTO\s+(?P<table>[\w.]+)\s*(?:\((?P<fields>[^)]*)\))?\s*"
+    r"(?P<select>SELECT\b.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+RE_SELECT = re.compile(
+    r"^\s*SELECT\s+(?P<fields>.+?)"
+    r"(?:\s+FROM\s+(?:\((?P<subquery>.+)\)\s+AS\s+\w+|(?P<table>[\w.]+))"
+    r"(?:\s+FINAL)?(?:\s+SAMPLE\s+\S+)?"
+    r"(?:\s+PREWHERE\s+(?P<prewhere>.+?))?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+GROUP BY\s+(?P<group_by>.+?))?"
+    r"(?:\s+ORDER BY\s+(?P<ordering>.+?))?"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+)(?:\s+OFFSET\s+(?P<offset>\d+))?)?)?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+RE_KILL = re.compile(
+    r"^\s*KILL\s+QUERY\s+WHERE\s+query_id\s*=\s*'(?P<query_id>[^']*)'", re.IGNORECASE
+)
+RE_CONDITION = r"\((\(?\w+\)?) (<=|>=|!=|=|<|>) ('(?:[^'\\]|\\.)*'|[^()']+?)\)"
+RE_WHERE = re.compile(rf"{RE_CONDITION}(?: and {RE_CONDITION})*")
+RE_CONDITIONS = re.compile(RE_CONDITION)
+RE_AGGREGATE = re.compile(
+    r"^(?P<function>count|min|max|sum)(?P<combinator>State|Merge)?\((?P<field>\w*)\)$",
+    re.IGNORECASE,
+)
+RE_ALIAS = re.compile(r"^(?P<expression>.+?)\s+AS\s+(?P<alias>\w+)$", re.IGNORECASE)
+
+OPERATORS = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+class FakeClickHouseError(Exception):
+    def __init__(self, message: str, status: int = 500):
+        super().__init__(message)
+        self.status = status
+
+
+class FakeTable(object):
+    def __init__(
+        self, columns: List[Tuple[str, str]], rows: Optional[List[tuple]] = None
+    ):
+        """
+
+        :param columns: pairs of column name and ClickHouse type
+        :param rows: initial rows of table
+        """
+        self.columns = list(columns)
+        self.rows = list(rows or [])
+        self.deduplication_tokens = set()
+
+    @property
+    def names(self) -> List[str]:
+        return [name for name, _ in self.columns]
+
+    @property
+    def types(self) -> Dict[str, str]:
+        return dict(self.columns)
+
+
+class FakeQuery(object):
+    __slots__ = ("query", "params", "body_size", "status")
+
+    def __init__(self, query: str, params: Dict[str, str], body_size: int):
+        self.query = query
+        self.params = params
+        self.body_size = body_size
+        self.status = 200
+
+    @property
+    def query_id(self) -> Optional[str]:
+        return self.params.get("query_id")
+
+
+class LiteralParser(object):
+    """ Parser of ClickHouse literals from VALUES: numbers, strings, NULL, tuples and arrays """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def skip(self):
+        while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n,":
+            self.pos += 1
+
+    def values(self) -> List[Any]:
+        result = []
+        self.skip()
+        while self.pos < len(self.text) and self.text[self.pos] != ";":
+            result.append(self.value())
+            self.skip()
+        return result
+
+    def value(self) -> Any:
+        sym = self.text[self.pos]
+        if sym in "([":
+            closing = ")" if sym == "(" else "]"
+            self.pos += 1
+            items = []
+            self.skip()
+            while self.text[self.pos] != closing:
+                items.append(self.value())
+                self.skip()
+            self.pos += 1
+            return tuple(items) if closing == ")" else items
+        if sym == "'":
+            return self.string()
+
+        start = self.pos
+        while self.pos < len(self.text) and self.text[self.pos] not in ",)] \t\r\n":
+            self.pos += 1
+        token = self.text[start : self.pos]
+        if token.upper() == "NULL":
+            return None
+        try:
+            return int(token)
+        except ValueError:
+            return float(token)
+
+    def string(self) -> str:
+        self.pos += 1
+        start = self.pos
+        while self.text[self.pos] != "'":
+            self.pos += 2 if self.text[self.pos] == "\\" else 1
+        raw = self.text[start : self.pos]
+        self.pos += 1
+        return StrType.decode(raw.encode())
+
+
+def parse_literal(text: str) -> Any:
+    return LiteralParser(text).value()
+
+
+def coerce(value: Any, ch_type: str) -> Any:
+    """ Literal from query to python value of column type """
+    if not isinstance(value, str):
+        return value
+    if (
+        ch_type.replace("LowCardinality(", "")
+        .replace("Nullable(", "")
+        .startswith(("String", "FixedString", "Enum"))
+    ):
+        return value
+    return what_py_type(ch_type).p_type(value)
+
+
+def tsv_cell(value: Any) -> bytes:
+    if value is None:
+        return b"\\N"
+    if isinstance(value, bool):
+        return b"1" if value else b"0"
+    if isinstance(value, str):
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .encode()
+        )
+    if isinstance(value, (list, tuple)):
+        return py2ch(value)
+    if isinstance(value, dt.datetime):
+        return str(value.replace(microsecond=0)).encode()
+    return str(value).encode()
+
+
+def json_cell(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [json_cell(item) for item in value]
+    return tsv_cell(value).decode()
+
+
+class FakeClickHouse(object):
+    """
+    In-process imitation of ClickHouse HTTP interface for load and latency testing.
+    Supports INSERT (VALUES, TSV, CSV, JSONEachRow), simple SELECT from in-memory tables
+    (fields, count/min/max/sum, conditions of BaseSQLBuilder, ORDER BY, LIMIT),
+    prepared responses for other queries and KILL QUERY
+
+    Usage:
+
+    async with FakeClickHouse(latency=0.01, error_rate=0.1) as fake:
+        fake.add_table("test.table", [("id", "UInt64"), ("name", "String")])
+        client = ChExecutorClient.init_client(session, fake.url, user, password, "test")
+        await client.create("table", [(1, "a")])
+
+        assert fake.tables["test.table"].rows == [(1, "a")]
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        chunk_size: Optional[int] = None,
+        chunk_delay: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None,
+        discard_inserts: bool = False,
+    ):
+        """
+
+        :param latency: delay in seconds before answer
+        :param error_rate: part of queries which fail with 500 status
+        :param chunk_size: size of response chunks for slow streaming, None - whole response
+        :param chunk_delay: delay in seconds between response chunks
+        :param host: address for listening
+        :param port: port for listening, 0 - random free port
+        :param seed: seed of random for error injection
+        :param discard_inserts: accept inserts without parsing, for measure of client throughput
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.host = host
+        self.port = port
+        self.discard_inserts = discard_inserts
+        self.url = None
+
+        self.tables = {}  # type: Dict[str, FakeTable]
+        self.responses = (
+            []
+        )  # type: List[Tuple[Pattern, List[Tuple[str, str]], List[tuple], Dict[str, bytes]]]
+        self.queries = []  # type: List[FakeQuery]
+        self.killed = []  # type: List[str]
+        self.active = 0
+        self.max_active = 0
+
+        self._failures = []  # type: List[Tuple[int, str]]
+        self._random = random.Random(seed)
+        self._runner = None
+
+    async def __aenter__(self) -> "FakeClickHouse":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    @property
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=1024**4)
+        app.router.add_route("*", "/", self.handle)
+        return app
+
+    async def start(self) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}/"
+        return self.url
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def add_table(
+        self,
+        name: str,
+        columns: List[Tuple[str, str]],
+        rows: Optional[List[tuple]] = None,
+    ) -> FakeTable:
+        """
+        :param name: table name with database, for example "test.table"
+        :param columns: pairs of column name and ClickHouse type
+        :param rows: initial rows
+        :return: table
+        """
+        self.tables[name] = FakeTable(columns, rows)
+        return self.tables[name]
+
+    def add_response(
+        self,
+        pattern: Union[str, Pattern],
+        columns: List[Tuple[str, str]],
+        rows: List[tuple],
+    ) -> None:
+        """
+        Prepared result for queries which match pattern, it is checked before tables.
+        Patterns are checked in order of addition, response for the same pattern is
+        replaced in place. Rendered response is cached, so it doesn't cost time of server
+        in benchmarks
+
+        :param pattern: regular expression for search in query
+        :param columns: pairs of column name and ClickHouse type
+        :param rows: result rows
+        """
+        response = (re.compile(pattern), list(columns), list(rows), {})
+        for index, (compiled, _, _, _) in enumerate(self.responses):
+            if compiled.pattern == response[0].pattern:
+                self.responses[index] = response
+                return
+        self.responses.append(response)
+
+    def fail_next(
+        self, count: int = 1, message: str = "Code: 999. DB::Exception: injected error"
+    ) -> None:
+        """ Next count queries fail with 500 status """
+        self._failures.extend([(500, message)] * count)
+
+    def table(self, name: str) -> FakeTable:
+        if name in self.tables:
+            return self.tables[name]
+        for full_name, table in self.tables.items():
+            if full_name.split(".")[-1] == name:
+                return table
+        raise FakeClickHouseError(
+            f"Code: 60. DB::Exception: Table {name} doesn't exist.", 404
+        )
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.read()
+        params = dict(request.query)
+        if "query" in params:
+            query = params["query"]
+        else:
+            query, body = body.decode(), b""
+
+        fake_query = FakeQuery(query, params, len(body))
+        self.queries.append(fake_query)
+
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+            if self._failures:
+                raise FakeClickHouseError(*reversed(self._failures.pop(0)))
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise FakeClickHouseError("Code: 999. DB::Exception: injected error")
+
+            return await self.execute(request, query, body, params)
+        except FakeClickHouseError as e:
+            fake_query.status = e.status
+            return web.Response(status=e.status, text=str(e))
+        finally:
+            self.active -= 1
+
+    async def execute(
+        self, request: web.Request, query: str, body: bytes, params: Dict[str, str]
+    ) -> web.StreamResponse:
+        query_id = params.get("query_id") or str(uuid.uuid4())
+        headers = {"X-ClickHouse-Query-Id": query_id}
+        query = RE_COMMENTS.sub(lambda match: match.group(1) or " ", query).strip()
+
+        kill_match = RE_KILL.match(query)
+        if kill_match:
+            self.killed.append(kill_match.group("query_id"))
+            return web.Response(body=b"", headers=headers)
+
+        if RE_INSERT_SELECT.match(query):
+            written = self.insert_select(query, params)
+            headers["X-ClickHouse-Summary"] = self.summary(written_rows=written)
+            return web.Response(body=b"", headers=headers)
+
+        if RE_INSERT.match(query):
+            written = 0 if self.discard_inserts else self.insert(query, body, params)
+            headers["X-ClickHouse-Summary"] = self.summary(written_rows=written)
+            return web.Response(body=b"", headers=headers)
+
+        fmt = "TabSeparated"
+        format_match = RE_FORMAT.search(query)
+        if format_match:
+            fmt = format_match.group(1)
+            query = query[: format_match.start()]
+
+        data, read_rows = self.select(query, fmt)
+        headers["X-ClickHouse-Summary"] = self.summary(
+            read_rows=read_rows, read_bytes=len(data)
+        )
+        return await self.stream(request, data, headers)
+
+    async def stream(
+        self, request: web.Request, data: bytes, headers: Dict[str, str]
+    ) -> web.StreamResponse:
+        if not self.chunk_size:
+            return web.Response(body=data, headers=headers)
+
+        resp = web.StreamResponse(headers=headers)
+        await resp.prepare(request)
+        for start in range(0, len(data), self.chunk_size):
+            await resp.write(data[start : start + self.chunk_size])
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+        await resp.write_eof()
+        return resp
+
+    @staticmethod
+    def summary(read_rows: int = 0, read_bytes: int = 0, written_rows: int = 0) -> str:
+        return json.dumps(
+            {
+                "read_rows": str(read_rows),
+                "read_bytes": str(read_bytes),
+                "written_rows": str(written_rows),
+                "written_bytes": "0",
+                "total_rows_to_read": str(read_rows),
+            }
+        )
+
+    def insert(self, query: str, body: bytes, params: Dict[str, str]) -> int:
+        match = RE_INSERT.match(query)
+        table = self.table(match.group("table"))
+        fields = [
+            field.strip()
+            for field in (match.group("fields") or "").split(",")
+            if field.strip()
+        ]
+        fields = fields or table.names
+        types = table.types
+
+        token = params.get("insert_deduplication_token")
+        if token is not None and token in table.deduplication_tokens:
+            return 0
+
+        if match.group("format"):
+            rows = self.parse_data(
+                match.group("format"),
+                (match.group("data") or "").encode() + body,
+                fields,
+                types,
+            )
+        else:
+            values = match.group("values") or ""
+            text = values + body.decode()
+            rows = [
+                tuple(coerce(value, types[field]) for field, value in zip(fields, row))
+                for row in LiteralParser(text).values()
+            ]
+
+        for row in rows:
+            values = dict(zip(fields, row))
+            table.rows.append(tuple(values.get(name) for name in table.names))
+
+        if token is not None:
+            table.deduplication_tokens.add(token)
+        return len(rows)
+
+    def insert_select(self, query: str, params: Dict[str, str]) -> int:
+        """ INSERT INTO ... SELECT, states of -State functions are stored as partial values """
+        match = RE_INSERT_SELECT.match(query)
+        table = self.table(match.group("table"))
+
+        token = params.get("insert_deduplication_token")
+        if token is not None and token in table.deduplication_tokens:
+            return 0
+
+        columns, rows, _ = self.evaluate(match.group("select"))
+        fields = [
+            field.strip()
+            for field in (match.group("fields") or "").split(",")
+            if field.strip()
+        ]
+        fields = fields or [name for name, _ in columns]
+
+        # rows are built before append, source can be the same table
+        new_rows = [dict(zip(fields, row)) for row in rows]
+        table.rows.extend(tuple(values.get(name) for name in table.names) for values in new_rows)
+
+        if token is not None:
+            table.deduplication_tokens.add(token)
+        return len(new_rows)
+
+    @staticmethod
+    def parse_data(
+        fmt: str, data: bytes, fields: List[str], types: Dict[str, str]
+    ) -> List[tuple]:
+        lines = [line for line in data.split(b"\n") if line]
+        converters = [what_py_type(types[field]).convert for field in fields]
+
+        if fmt in ("TabSeparated", "TSV", "TabSeparatedWithNames", "TSVWithNames"):
+            if fmt.endswith("WithNames"):
+                lines = lines[1:]
+            return [
+                tuple(
+                    None if cell == b"\\N" else converter(cell)
+                    for converter, cell in zip(converters, line.split(b"\t"))
+                )
+                for line in lines
+            ]
+
+        if fmt in ("CSV", "CSVWithNames"):
+            reader = csv.reader(io.StringIO(data.decode()))
+            rows = list(reader)
+            if fmt == "CSVWithNames":
+                rows = rows[1:]
+            return [
+                tuple(
+                    (
+                        coerce(cell, types[field])
+                        if not types[field].startswith(("Int", "UInt", "Float"))
+                        else what_py_type(types[field]).convert(cell.encode())
+                    )
+                    for field, cell in zip(fields, row)
+                )
+                for row in rows
+            ]
+
+        if fmt == "JSONEachRow":
+            return [
+                tuple(coerce(item.get(field), types[field]) for field in fields)
+                for item in map(json.loads, lines)
+            ]
+
+        raise FakeClickHouseError(f"Code: 73. DB::Exception: Unknown format {fmt}", 400)
+
+    def select(self, query: str, fmt: str) -> Tuple[bytes, int]:
+        for pattern, columns, rows, rendered in self.responses:
+            if pattern.search(query):
+                if fmt not in rendered:
+                    rendered[fmt] = self.render(fmt, columns, rows)
+                return rendered[fmt], len(rows)
+
+        columns, rows, read_rows = self.evaluate(query)
+        return self.render(fmt, columns, rows), read_rows
+
+    def evaluate(self, query: str) -> Tuple[List[Tuple[str, str]], List[tuple], int]:
+        match = RE_SELECT.match(query)
+        if not match:
+            raise FakeClickHouseError(
+                f"Code: 62. DB::Exception: Fake doesn't support query: {query}", 400
+            )
+
+        if match.group("subquery"):
+            columns, rows, read_rows = self.evaluate(match.group("subquery"))
+        elif match.group("table"):
+            table = self.table(match.group("table"))
+            columns, rows, read_rows = table.columns, table.rows, len(table.rows)
+        else:
+            columns, rows, read_rows = [], [()], 0
+
+        names = [name for name, _ in columns]
+        types = dict(columns)
+
+        for condition in filter(None, [match.group("prewhere"), match.group("where")]):
+            if not RE_WHERE.fullmatch(condition):
+                raise FakeClickHouseError(
+                    f"Code: 62. DB::Exception: Fake doesn't support condition: {condition}",
+                    400,
+                )
+            for field, operator, value in RE_CONDITIONS.findall(condition):
+                field = field.strip("()")
+                index = names.index(field)
+                value = coerce(parse_literal(value), types[field])
+                rows = [row for row in rows if OPERATORS[operator](row[index], value)]
+
+        if match.group("ordering"):
+            for item in reversed(match.group("ordering").split(",")):
+                field, _, direction = item.strip().partition(" ")
+                index = names.index(field)
+                rows = sorted(
+                    rows,
+                    key=lambda row: row[index],
+                    reverse=direction.upper() == "DESC",
+                )
+
+        if match.group("group_by"):
+            keys = [names.index(field.strip()) for field in match.group("group_by").split(",")]
+            groups = {}
+            for row in rows:
+                groups.setdefault(tuple(row[index] for index in keys), []).append(row)
+
+            result_columns = self.project(match.group("fields"), columns, [])[0]
+            result_rows = []
+            for group_rows in groups.values():
+                result_rows.extend(
+                    self.project(match.group("fields"), columns, group_rows)[1]
+                )
+            columns, rows = result_columns, result_rows
+        else:
+            columns, rows = self.project(match.group("fields"), columns, rows)
+
+        offset = int(match.group("offset") or 0)
+        if match.group("limit"):
+            rows = rows[offset : offset + int(match.group("limit"))]
+
+        return columns, rows, read_rows
+
+    @staticmethod
+    def project(
+        fields: str, columns: List[Tuple[str, str]], rows: List[tuple]
+    ) -> Tuple[List[Tuple[str, str]], List[tuple]]:
+        if fields.strip() == "*":
+            return columns, rows
+
+        names = [name for name, _ in columns]
+        types = dict(columns)
+
+        result_columns = []
+        getters = []
+        aggregates = []
+        for field in split_top_level(fields):
+            alias_match = RE_ALIAS.match(field)
+            expression, alias = field, field
+            if alias_match:
+                expression, alias = alias_match.group("expression", "alias")
+
+            aggregate_match = RE_AGGREGATE.match(expression)
+            aggregates.append(bool(aggregate_match))
+            if aggregate_match:
+                function, combinator, name = aggregate_match.group(
+                    "function", "combinator", "field"
+                )
+                function = function.lower()
+                if function == "count":
+                    result_columns.append((alias, "UInt64"))
+                    if not name:
+                        getters.append(len)
+                    else:
+                        # countMerge sums partial counts, count(field) skips NULL
+                        getters.append(
+                            aggregate_getter(
+                                "sum" if combinator == "Merge" else "count",
+                                names.index(name),
+                            )
+                        )
+                    continue
+
+                tp = types[name]
+                if function == "sum":
+                    tp = "Float64" if "Float" in tp or "Decimal" in tp else "Int64"
+                elif not tp.startswith("Nullable"):
+                    tp = f"Nullable({tp})"
+                result_columns.append((alias, tp))
+                getters.append(aggregate_getter(function, names.index(name)))
+            elif expression in names:
+                result_columns.append((alias, types[expression]))
+                getters.append(itemgetter(names.index(expression)))
+            else:
+                value = parse_literal(expression)
+                result_columns.append(
+                    (alias, "Int64" if isinstance(value, int) else "String")
+                )
+                getters.append(lambda row, value=value: value)
+
+        if any(aggregates):
+            # columns out of aggregate functions are keys of GROUP BY, equal in all rows
+            return result_columns, [
+                tuple(
+                    getter(rows) if is_aggregate else (getter(rows[0]) if rows else None)
+                    for getter, is_aggregate in zip(getters, aggregates)
+                )
+            ]
+        return result_columns, [
+            tuple(getter(row) for getter in getters) for row in rows
+        ]
+
+    @staticmethod
+    def render(fmt: str, columns: List[Tuple[str, str]], rows: List[tuple]) -> bytes:
+        names = [name for name, _ in columns]
+
+        if fmt in (
+            "TabSeparated",
+            "TSV",
+            "TabSeparatedWithNames",
+            "TSVWithNames",
+            "TabSeparatedWithNamesAndTypes",
+            "TSVWithNamesAndTypes",
+        ):
+            lines = []
+            if "WithNames" in fmt:
+                lines.append("\t".join(names).encode())
+            if fmt.endswith("AndTypes"):
+                lines.append("\t".join(tp for _, tp in columns).encode())
+            lines.extend(b"\t".join(tsv_cell(value) for value in row) for row in rows)
+            return b"".join(line + b"\n" for line in lines)
+
+        if fmt in ("CSV", "CSVWithNames"):
+            output = io.StringIO()
+            writer = csv.writer(output, lineterminator="\n")
+            if fmt == "CSVWithNames":
+                writer.writerow(names)
+            writer.writerows(
+                [[tsv_cell(value).decode() for value in row] for row in rows]
+            )
+            return output.getvalue().encode()
+
+        if fmt == "JSONEachRow":
+            return b"".join(
+                json.dumps(dict(zip(names, map(json_cell, row)))).encode() + b"\n"
+                for row in rows
+            )
+
+        raise FakeClickHouseError(f"Code: 73. DB::Exception: Unknown format {fmt}", 400)
+
+
+def aggregate_getter(function: str, index: int) -> Callable[[List[tuple]], Any]:
+    def getter(rows: List[tuple]) -> Any:
+        values = [row[index] for row in rows if row[index] is not None]
+        if function == "sum":
+            return sum(values)
+        if function == "count":
+            return len(values)
+        return (min if function == "min" else max)(values, default=None)
+
+    return getter
+
+
+def split_top_level(string: str) -> List[str]:
+    """ Split by commas which aren't in brackets or quotes """
+    parts = []
+    depth = 0
+    in_str = False
+    current = []
+    for sym in string:
+        if sym == "'" and (not current or current[-1] != "\\"):
+            in_str = not in_str
+        elif not in_str and sym in "([":
+            depth += 1
+        elif not in_str and sym in ")]":
+            depth -= 1
+        elif not in_str and depth == 0 and sym == ",":
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(sym)
+    parts.append("".join(current).strip())
+    return parts
@@ -0,0 +1,86 @@
+import pytest
+from aiohttp import ClientSession
+
+from clickhouse_utils.client import ChExecutorClient
+from clickhouse_utils.testing import FakeClickHouse
+
+
+columns = [("id", "UInt64"), ("name", "String")]
+rows = [(1, "a"), (2, "b"), (3, "c")]
+
+
+@pytest.mark.asyncio
+async def test_batch_fuse_scalars():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        fake.add_table("test.table", columns, rows)
+        fake.add_response(r"\) AS v1", [("v0", "UInt64"), ("v1", "UInt64")], [(2, 3)])
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        async with client.batch() as batch:
+            obj = batch.get_object("table", {"id": 1})
+            count = batch.get_count(table="table", filter_params={"id__gt": 1})
+            max_id = batch.raw("SELECT max(id) FROM test.table;", "fetchval")
+
+        assert obj.result()["name"] == "a", "object not eq"
+
+        assert (count.result(), max_id.result()) == (2, 3), "each call must get own value of fused row"
+
+        assert len(fake.queries) == 2, "scalar queries must be fused in one query"
+
+        fused = [query.query for query in fake.queries if "AS v1" in query.query][0]
+
+        assert fused.startswith(
+            "SELECT (SELECT count() FROM test.table WHERE (id > 1)) AS v0, (SELECT max(id) FROM test.table) AS v1"
+        ), "fused query not eq"
+
+
+@pytest.mark.asyncio
+async def test_batch_fused_error():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        fake.add_table("test.table", columns, rows)
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        async with client.batch() as batch:
+            count = batch.get_count(table="table")
+            missing = batch.raw("SELECT max(id) FROM test.missing", "fetchval")
+
+        assert count.result() == 3, "query must be repeated after error of fused query"
+
+        with pytest.raises(Exception):
+            missing.result()
+
+        assert len(fake.queries) == 3, "fused query and two separate queries"
+
+
+@pytest.mark.asyncio
+async def test_batch_concurrency():
+    async with FakeClickHouse(latency=0.02) as fake, ClientSession() as session:
+        fake.add_table("test.table", columns, rows)
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        async with client.batch(concurrency=2, fuse=False) as batch:
+            objs = [batch.get_object("table", {"id": i % 3 + 1}) for i in range(6)]
+            counts = [batch.get_count(table="table") for _ in range(2)]
+
+        assert [obj.result()["id"] for obj in objs] == [1, 2, 3, 1, 2, 3], "results must be in order of calls"
+
+        assert [count.result() for count in counts] == [3, 3], "counts not eq"
+
+        assert len(fake.queries) == 8, "without fuse each call is separate query"
+
+        assert fake.max_active <= 2, "batch must respect concurrency"
+
+
+@pytest.mark.asyncio
+async def test_batch_cancel_on_error():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        with pytest.raises(ValueError):
+            async with client.batch() as batch:
+                count = batch.get_count(table="table")
+                raise ValueError()
+
+        assert count.cancelled(), "calls must be cancelled on error in context"
+
+        assert not fake.queries, "queries mustn't be sent"
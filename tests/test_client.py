@@ -1,9 +1,13 @@
+import asyncio
 from unittest.mock import patch
 import pytest
 
 from aiohttp import ClientSession
 from clickhouse_utils.client import ChExecutorClient, AbstractChExecutorClient
 from aiochclient.client import ChClient
+from clickhouse_utils.connection import ConnectionSettings
+from clickhouse_utils.exceptions import InsertError
+from clickhouse_utils.testing import FakeClickHouse
 
 
 @pytest.mark.asyncio
@@ -36,3 +40,204 @@ async def test_init_client():
             assert client.client.params.get(key) == value, f"check value for {key} not eq params in client"
 
 
+@pytest.mark.asyncio
+async def test_get_aggregate_with_totals():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        fake.add_response(
+            r"GROUP BY country WITH TOTALS",
+            [("country", "String"), ("n", "UInt64")],
+            [("de", 2), ("fr", 1), (), ("", 3)],
+        )
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        rows, totals = await client.get_aggregate(
+            "table", {"n": "count"}, group_by=["country"], with_totals=True
+        )
+
+        assert [row[:] for row in rows] == [("de", 2), ("fr", 1)], "rows not eq"
+
+        assert totals["n"] == 3, "totals not eq"
+
+        rows, totals = await client.get_aggregate(
+            "table", {"n": "count"}, group_by=["country"], with_totals=True, lazy=True
+        )
+
+        assert [row["n"] for row in rows] == [2, 1] and totals["n"] == 3, "lazy rows not eq"
+
+
+@pytest.mark.asyncio
+async def test_get_list_auto_prewhere():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        fake.add_table(
+            "system.columns",
+            [("database", "String"), ("table", "String"), ("name", "String"), ("data_compressed_bytes", "UInt64")],
+            [("test", "table", "id", 100), ("test", "table", "body", 100000)],
+        )
+        fake.add_table("test.table", [("id", "UInt64"), ("body", "String")], [(1, "a"), (2, "b"), (3, "a")])
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        rows = await client.get_list("table", filter_params={"id__gte": 2, "body": "a"}, prewhere=True)
+
+        assert [row[:] for row in rows] == [(3, "a")], "rows not eq"
+
+        assert "PREWHERE (id >= 2) WHERE (body = 'a')" in fake.queries[-1].query, "id must be in prewhere"
+
+        await client.get_list("table", filter_params={"id": 1}, prewhere=True)
+
+        assert len(fake.queries) == 3, "column sizes must be cached"
+
+
+@pytest.mark.asyncio
+async def test_get_count():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        fake.add_table("system.tables", [("database", "String"), ("name", "String"), ("total_rows", "Nullable(UInt64)")],
+                       [("test", "table", 1000000), ("test", "view", None)])
+        fake.add_table("test.table", [("id", "UInt64")], [(1,), (2,), (3,)])
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        count = await client.get_count(table="table", filter_params={"id__gt": 1}, fields=["id"])
+
+        assert count == 2, "count not eq"
+
+        assert fake.queries[-1].query.startswith("SELECT count() FROM test.table WHERE (id > 1)"), "count mustn't use subquery"
+
+        assert await client.get_count(table="table", estimate=True) == 1000000, "count must be from system.tables"
+
+        assert await client.get_count(table="table", filter_params={"id": 1}, estimate=True) == 1, "count with conditions must be exact"
+
+        assert await client.get_count(table="table", final=True, estimate=True) == 3, "count with FINAL must be exact"
+
+        fake.add_table("test.view", [("id", "UInt64")], [(1,), (2,), (3,)])
+
+        assert await client.get_count(table="view", estimate=True) == 3, "count must be exact if total_rows is NULL"
+
+
+@pytest.mark.asyncio
+async def test_own_session_pool():
+    async with FakeClickHouse(latency=0.05) as fake:
+        settings = ConnectionSettings(limit=5, keepalive_timeout=30)
+
+        async with ChExecutorClient.init_client(
+            None, fake.url, "debug", "debug", "test", connection_settings=settings
+        ) as client:
+            assert client.owns_session, "client must own session"
+
+            assert await client.warm_up(3) == 3, "all connections must be opened"
+
+            stats = client.pool_stats()
+
+            assert stats["limit"] == 5, "limit not eq"
+
+            assert stats["idle"] == 3, "warmed connections must stay in pool"
+
+            assert fake.max_active == 3, "connections must be concurrent"
+
+        assert client.session.closed, "own session must be closed"
+
+    async with ClientSession() as session:
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+        await client.close()
+
+        assert not session.closed, "session from caller mustn't be closed"
+
+
+@pytest.mark.asyncio
+async def test_kill_query_on_timeout_and_cancel():
+    async with FakeClickHouse(latency=0.5) as fake, ClientSession() as session:
+        fake.add_table("test.table", [("id", "UInt64")], [(1,)])
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        with pytest.raises(asyncio.TimeoutError):
+            await client.get_list("table", query_id="list-1", timeout=0.1)
+
+        task = asyncio.ensure_future(client.get_object("table", query_id="object-1"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await asyncio.sleep(0.6)
+
+        assert fake.killed == ["list-1", "object-1"], "queries must be killed"
+
+        assert fake.queries[0].params["max_execution_time"] == "1", "deadline must be sent to server"
+
+        rows = await client.raw("SELECT * FROM test.table", "fetch", timeout=5)
+
+        assert fake.queries[-1].query_id is not None, "each query must have query_id"
+
+        assert [row[0] for row in rows] == [1], "rows not eq"
+
+        for query in [
+            "-- report\nSELECT * FROM test.table",
+            "/* report */ SELECT * FROM test.table",
+            "SELECT * FROM test.table -- report",
+        ]:
+            rows = await client.raw(query, "fetch")
+
+            assert [row[0] for row in rows] == [1], "query with leading comment must be fetched"
+
+        fake.add_response(r"^EXPLAIN", [("explain", "String")], [("ReadFromMergeTree",)])
+        plan = await client.raw("EXPLAIN SELECT * FROM test.table", "fetchval")
+
+        assert plan == "ReadFromMergeTree", "rows of any statement except DDL and INSERT must be fetched"
+
+        rows = await client.raw("SELECT * FROM test.table format JSONEachRow", "fetch")
+
+        assert rows == [{"id": 1}], "FORMAT must be detected in any case"
+
+        rows = await client.raw("-- copy\nINSERT INTO test.table SELECT * FROM test.table", "fetch")
+
+        assert rows == [] and "FORMAT" not in fake.queries[-1].query, "INSERT hasn't rows"
+
+
+@pytest.mark.asyncio
+async def test_write_query_id_and_timeout(tmp_path):
+    async with FakeClickHouse(latency=0.5) as fake, ClientSession() as session:
+        fake.add_table("test.table", [("id", "UInt64")], [(1,)])
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        start = asyncio.get_event_loop().time()
+        with pytest.raises(InsertError) as error:
+            await client.create("table", [(2,), (3,)], block_size=1, timeout=0.1, query_id="ins-1")
+
+        assert asyncio.get_event_loop().time() - start < 0.4, "insert must be stopped by deadline"
+
+        assert all(isinstance(result.error, asyncio.TimeoutError) for result in error.value.results), "blocks must fail by deadline"
+
+        with pytest.raises(asyncio.TimeoutError):
+            await client.export_to_file("SELECT * FROM test.table", tmp_path / "dump.tsv", timeout=0.1, query_id="exp-1")
+
+        with pytest.raises(asyncio.TimeoutError):
+            await client.import_from_file("table", b"4\n", timeout=0.1, query_id="imp-1")
+
+        await asyncio.sleep(0.6)
+
+        assert fake.queries[0].query_id == "ins-1-0", "query_id of block must be sent"
+
+        assert fake.queries[0].params["max_execution_time"] == "1", "deadline must be sent to server"
+
+        assert {"ins-1-0", "exp-1", "imp-1"} <= set(fake.killed), "queries must be killed"
+
+
+@pytest.mark.asyncio
+async def test_kill_query_on_early_close():
+    async with FakeClickHouse(chunk_size=16, chunk_delay=0.01) as fake, ClientSession() as session:
+        fake.add_table("test.table", [("id", "UInt64")], [(i,) for i in range(1000)])
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        obj = await client.get_object("table", query_id="object-1")
+
+        assert obj["id"] == 0, "object not eq"
+
+        assert "LIMIT 1" in fake.queries[0].query, "object must be selected with LIMIT 1"
+
+        rows = await client.raw("SELECT * FROM test.table", "iterate", query_id="iterate-1")
+        async for _ in rows:
+            break
+        await rows.aclose()
+
+        await asyncio.sleep(0.1)
+
+        assert fake.killed == ["iterate-1"], "query must be killed if rows aren't read to the end"
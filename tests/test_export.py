@@ -0,0 +1,67 @@
+import datetime as dt
+
+import pytest
+from aiohttp import ClientSession
+
+from clickhouse_utils.client import ChExecutorClient
+from clickhouse_utils.export import part_filters, range_bounds
+from clickhouse_utils.testing import FakeClickHouse
+
+
+def test_range_bounds():
+    assert range_bounds(0, 100, 4) == [0, 25, 50, 75, 100], "int bounds not eq"
+
+    assert range_bounds(0, 2, 4) == [0, 1, 2], "bounds must be unique"
+
+    check_bounds = [dt.date(2020, 1, 1), dt.date(2020, 1, 6), dt.date(2020, 1, 11)]
+
+    assert range_bounds(dt.date(2020, 1, 1), dt.date(2020, 1, 11), 2) == check_bounds, "date bounds not eq"
+
+
+def test_part_filters():
+    check_filters = [
+        {"(id)__gte": 0, "(id)__lt": 50},
+        {"(id)__gte": 50, "(id)__lte": 100},
+    ]
+
+    assert part_filters("id", 2, bounds=[0, 50, 100]) == check_filters, "range filters not eq"
+
+    check_filters = [{"cityHash64(id) % 2": 0}, {"cityHash64(id) % 2": 1}]
+
+    assert part_filters("id", 2, "hash") == check_filters, "hash filters not eq"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [True, False])
+async def test_parallel_export(ordered):
+    rows = [(i, f"name {i}") for i in range(100)]
+
+    async with FakeClickHouse(chunk_size=64) as fake, ClientSession() as session:
+        fake.add_table("test.table", [("id", "UInt64"), ("name", "String")], rows)
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        progress = []
+        batches = [
+            batch
+            async for batch in client.parallel_export(
+                "table",
+                filter_params={"id__gte": 10},
+                split_by="id",
+                parts=4,
+                ordered=ordered,
+                concurrency=2,
+                batch_size=7,
+                progress=progress.append,
+            )
+        ]
+
+        exported = sorted(row[:] for batch in batches for row in batch.rows)
+
+        assert exported == rows[10:], "exported rows not eq"
+
+        assert fake.max_active <= 2, "concurrency limit is exceeded"
+
+        assert sorted(item.part for item in progress if item.done) == [0, 1, 2, 3], "all parts must be done"
+
+        if ordered:
+            assert [batch.part for batch in batches] == sorted(batch.part for batch in batches), "parts not ordered"
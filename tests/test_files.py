@@ -0,0 +1,74 @@
+import asyncio
+import io
+import mmap
+
+import pytest
+from aiohttp import ClientSession
+
+from clickhouse_utils.client import ChExecutorClient
+from clickhouse_utils.files import read_chunks, written_rows
+from clickhouse_utils.testing import FakeClickHouse
+
+
+columns = [("id", "UInt64"), ("name", "String")]
+
+
+@pytest.mark.asyncio
+async def test_read_chunks(tmp_path):
+    data = b"0123456789"
+    path = tmp_path / "data.tsv"
+    path.write_bytes(data)
+
+    for source in (str(path), path, io.BytesIO(data), data):
+        chunks = [chunk async for chunk in read_chunks(source, 4)]
+
+        assert chunks == [b"0123", b"4567", b"89"], f"chunks of {type(source)} not eq"
+
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        assert b"".join([chunk async for chunk in read_chunks(mapped, 3)]) == data, "chunks of mmap not eq"
+
+
+def test_written_rows():
+    assert written_rows('{"read_rows":"0","written_rows":"10"}') == 10, "written rows not eq"
+
+    assert written_rows(None) is None, "without summary must be None"
+
+
+@pytest.mark.asyncio
+async def test_export_import_file(tmp_path):
+    rows = [(i, f"name\t{i}") for i in range(1000)]
+    path = tmp_path / "export.tsv"
+
+    async with FakeClickHouse(chunk_size=256) as fake, ClientSession() as session:
+        fake.add_table("test.source", columns, rows)
+        target = fake.add_table("test.target", columns)
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        size = await client.export_to_file("SELECT * FROM test.source", path, "TSV", chunk_size=100)
+
+        assert size == path.stat().st_size, "size not eq"
+
+        written = await client.import_from_file("target", path, "TSV", fields=["id", "name"], chunk_size=100)
+
+        assert written == len(rows), "written rows not eq"
+
+        assert target.rows == rows, "imported rows not eq"
+
+
+@pytest.mark.asyncio
+async def test_export_failed_file(tmp_path):
+    rows = [(i, f"name {i}") for i in range(1000)]
+    path = tmp_path / "export.tsv"
+
+    async with FakeClickHouse(chunk_size=256, chunk_delay=0.01) as fake, ClientSession() as session:
+        fake.add_table("test.source", columns, rows)
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        size = await client.export_to_file("SELECT * FROM test.source;", path, "TSV")
+
+        assert size == path.stat().st_size, "query with ; must be exported"
+
+        with pytest.raises(asyncio.TimeoutError):
+            await client.export_to_file("SELECT * FROM test.source", path, "TSV", timeout=0.05)
+
+        assert not path.exists(), "partial file must be removed"
@@ -0,0 +1,69 @@
+from clickhouse_utils.insert import (
+    AsyncInsertSettings,
+    InsertBlockResult,
+    InsertMetrics,
+    split_blocks,
+    block_token,
+)
+from clickhouse_utils.retry import RetryPolicy
+from aiohttp import ClientError
+
+
+def test_split_blocks():
+    values = [(i,) for i in range(5)]
+
+    assert list(split_blocks(values)) == [values], "without block_size must be one block"
+
+    blocks = list(split_blocks(values, 2))
+
+    assert blocks == [values[0:2], values[2:4], values[4:5]], "blocks not eq"
+
+
+def test_block_token():
+    query = "INSERT INTO test_db.test_table VALUES (1)"
+
+    assert block_token(query, 0) == block_token(query, 3), "token must depend only on content"
+
+    assert block_token(query, 0) != block_token(query + ",(2)", 0), "token must depend on content"
+
+    assert block_token(query, 2, "batch") == "batch_2", "caller token must be used"
+
+
+def test_retry_policy():
+    policy = RetryPolicy(attempts=3, base_delay=0.1, max_delay=0.3, jitter=False)
+
+    assert [policy.delay(attempt) for attempt in (1, 2, 3)] == [0.1, 0.2, 0.3], "delays not eq"
+
+    assert policy.can_retry(1, ClientError()), "network error must be retried"
+
+    assert not policy.can_retry(3, ClientError()), "attempts are over"
+
+    assert not policy.can_retry(1, ValueError()), "unknown error mustn't be retried"
+
+
+def test_async_insert_settings():
+    settings = AsyncInsertSettings(wait_for_async_insert=False, busy_timeout_ms=200)
+
+    check_settings = {
+        "async_insert": 1,
+        "wait_for_async_insert": 0,
+        "async_insert_busy_timeout_ms": 200,
+    }
+
+    assert settings.to_settings() == check_settings, "settings not eq"
+
+    assert not settings.flushed, "write without wait isn't flushed"
+
+    assert AsyncInsertSettings(enabled=False).to_settings() == {}, "disabled mode must be without settings"
+
+
+def test_insert_metrics():
+    metrics = InsertMetrics()
+
+    metrics.add(InsertBlockResult(0, 10, None, 1, None, True))
+    metrics.add(InsertBlockResult(1, 5, None, 1, None, False))
+    metrics.add(InsertBlockResult(2, 3, None, 3, ClientError(), False))
+
+    assert metrics.acknowledged_rows == 15, "acknowledged rows not eq"
+    assert metrics.flushed_rows == 10, "flushed rows not eq"
+    assert metrics.failed_blocks == 1, "failed blocks not eq"
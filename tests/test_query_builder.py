@@ -112,3 +112,81 @@ def test_select():
                    f"LIMIT {limit} OFFSET {offset} ORDER BY created DESC"
 
     assert select_query == check_select, eq_error_msg
+
+
+def test_aggregate():
+    aggregations = {
+        "n": "count",
+        "total": "amount__sum",
+        "users": "user_id__uniq",
+        "p": ("latency__quantiles", [0.5, 0.9]),
+    }
+    conditions = {"amount__gt": 0}
+    having = {"total__gte": 100}
+
+    aggregate_query = BaseSQLBuilder.aggregate(
+        destination, aggregations, conditions, group_by=["country"], having=having,
+        ordering=["-total"], pagination={"limit": 10, "offset": 0}, with_totals=True,
+    )
+
+    check_aggregate = "SELECT country, count() AS n, sum(amount) AS total, uniq(user_id) AS users, " \
+        "quantiles(0.5, 0.9)(latency) AS p FROM test_db.test_table WHERE (amount > 0) " \
+        "GROUP BY country WITH TOTALS HAVING (total >= 100) ORDER BY total DESC LIMIT 10 OFFSET 0"
+
+    assert aggregate_query == check_aggregate, eq_error_msg
+
+
+def test_aggregate_without_group_by():
+    aggregate_query = BaseSQLBuilder.aggregate(destination, {"last": "created__max"})
+
+    check_aggregate = "SELECT max(created) AS last FROM test_db.test_table"
+
+    assert aggregate_query == check_aggregate, eq_error_msg
+
+    with pytest.raises(AssertionError):
+        BaseSQLBuilder.aggregate(destination, {"last": "created__max"}, with_totals=True)
+
+
+def test_aggregate_combinators():
+    aggregate_query = BaseSQLBuilder.aggregate(
+        destination, {"users": "user_id__uniqState", "p": ("p__quantilesMerge", [0.5])}
+    )
+
+    check_aggregate = "SELECT uniqState(user_id) AS users, quantilesMerge(0.5)(p) AS p FROM test_db.test_table"
+
+    assert aggregate_query == check_aggregate, eq_error_msg
+
+
+def test_prewhere_sample_final_select():
+    select_query = BaseSQLBuilder.select(
+        destination, filter_params={"b": "exact_s"}, prewhere_params={"a__gt": 1}, sample=0.1, final=True
+    )
+
+    check_select = "SELECT * FROM test_db.test_table FINAL SAMPLE 0.1 PREWHERE (a > 1) WHERE (b = 'exact_s')"
+
+    assert select_query == check_select, eq_error_msg
+
+
+def test_split_prewhere():
+    conditions = {"a__gte": 1, "a__lt": 5, "b": "text"}
+    column_sizes = {"a": 100, "b": 10000}
+
+    prewhere, where = BaseSQLBuilder.split_prewhere(conditions, column_sizes)
+
+    assert prewhere == {"a__gte": 1, "a__lt": 5}, "narrowest column must be in prewhere"
+
+    assert where == {"b": "text"}, "other columns must be in where"
+
+
+def test_count():
+    count_query = BaseSQLBuilder.count(destination, {"a__gt": 1}, final=True)
+
+    check_count = "SELECT count() FROM test_db.test_table FINAL WHERE (a > 1)"
+
+    assert count_query == check_count, eq_error_msg
+
+    count_query = BaseSQLBuilder.count(destination, sample=0.1)
+
+    check_count = "SELECT toUInt64(round(sum(_sample_factor))) FROM test_db.test_table SAMPLE 0.1"
+
+    assert count_query == check_count, eq_error_msg
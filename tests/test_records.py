@@ -0,0 +1,63 @@
+import datetime as dt
+
+import pytest
+from aiohttp import ClientSession
+
+from clickhouse_utils.client import ChExecutorClient
+from clickhouse_utils.records import LazyRecord, LazyRecordsFabric
+from clickhouse_utils.testing import FakeClickHouse
+
+
+def test_lazy_record():
+    calls = []
+
+    def converter(value):
+        calls.append(value)
+        return value.decode()
+
+    record = LazyRecord(b"a\tb\tc", {"x": 0, "y": 1, "z": 2}, [converter] * 3)
+
+    assert record["y"] == "b", "value by name not eq"
+
+    assert record[1] == "b", "value by index not eq"
+
+    assert calls == [b"b"], "only read cell must be decoded once"
+
+    assert record[:] == ("a", "b", "c"), "slice not eq"
+
+    assert record[-1] == "c", "negative index not eq"
+
+    assert list(record.keys()) == ["x", "y", "z"], "keys not eq"
+
+    with pytest.raises(IndexError):
+        record[3]
+
+
+def test_lazy_records_fabric():
+    fabric = LazyRecordsFabric(tps=b"UInt64\tNullable(String)\tDateTime\n", names=b"id\tname\tcreated\n")
+
+    record = fabric.new(b"1\t\\N\t2020-01-01 00:00:00\n")
+
+    assert record[:] == (1, None, dt.datetime(2020, 1, 1)), "values not eq"
+
+    assert len(fabric.new(b"\n")) == 0, "empty row must be without fields"
+
+
+@pytest.mark.asyncio
+async def test_get_list_lazy():
+    columns = [("id", "UInt64"), ("tags", "Array(String)"), ("value", "Nullable(Float64)")]
+    rows = [(1, ["a", "b"], None), (2, [], 2.5)]
+
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        fake.add_table("test.table", columns, rows)
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        records = await client.get_list("table", lazy=True)
+
+        assert all(isinstance(record, LazyRecord) for record in records), "records must be lazy"
+
+        assert [record[:] for record in records] == rows, "rows not eq"
+
+        record = await client.get_object("table", {"id": 2}, lazy=True)
+
+        assert record["value"] == 2.5, "value not eq"
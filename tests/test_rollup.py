@@ -0,0 +1,130 @@
+import pytest
+from aiohttp import ClientSession
+
+from clickhouse_utils.client import ChExecutorClient
+from clickhouse_utils.rollup import MemoryStore, Rollup, TableStore
+from clickhouse_utils.testing import FakeClickHouse
+
+
+columns = [("id", "UInt64"), ("country", "String"), ("amount", "UInt64")]
+aggregations = {"n": "count", "total": "amount__sum", "top": "amount__max", "mean": "amount__avg"}
+
+
+def make_rows(start, stop):
+    return [(i, "de" if i % 2 else "fr", i * 10) for i in range(start, stop)]
+
+
+def by_country(rows):
+    return {row["country"]: row for row in rows}
+
+
+@pytest.mark.asyncio
+async def test_memory_rollup(tmp_path):
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        table = fake.add_table("test.events", columns, make_rows(1, 5))
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+        path = tmp_path / "rollup.pickle"
+
+        rollup = Rollup(client, "events", aggregations, "id", ["country"], store=MemoryStore(path))
+
+        assert await rollup.refresh(), "first refresh must aggregate all rows"
+
+        assert not await rollup.refresh(), "refresh without new rows mustn't merge"
+
+        table.rows.extend(make_rows(5, 8))
+        rows = by_country(await rollup.fetch(refresh=True))
+
+        check_rows = {
+            "de": {"country": "de", "n": 4, "total": 160, "top": 70, "mean": 40.0},
+            "fr": {"country": "fr", "n": 3, "total": 120, "top": 60, "mean": 40.0},
+        }
+
+        assert rows == check_rows, "merged rows not eq aggregation of all rows"
+
+        assert "((id) > 4) and ((id) <= 7)" in fake.queries[-1].query, "only new rows must be aggregated"
+
+        restored = Rollup(client, "events", aggregations, "id", ["country"], store=MemoryStore(path))
+
+        assert by_country(await restored.fetch()) == check_rows, "state must be restored from file"
+
+        assert restored.store.watermark == 7, "watermark not eq"
+
+
+@pytest.mark.asyncio
+async def test_memory_rollup_lag():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        fake.add_table("test.events", columns, make_rows(1, 11))
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        rollup = Rollup(client, "events", {"n": "count"}, "id", lag=3)
+
+        assert await rollup.fetch(refresh=True) == [{"n": 7}], "rows of lag mustn't be aggregated"
+
+        assert rollup.store.watermark == 7, "watermark must be less by lag"
+
+
+@pytest.mark.asyncio
+async def test_memory_rollup_caller_bound_and_nulls():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        table = fake.add_table("test.events", [("id", "UInt64"), ("amount", "Nullable(UInt64)")], [(1, None), (2, 5)])
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        rollup = Rollup(client, "events", {"n": "count", "top": "amount__max"}, "id", filter_params={"id__lte": 2})
+        await rollup.refresh()
+
+        table.rows.extend([(3, None), (4, 9)])
+        await rollup.refresh()
+
+        assert await rollup.fetch() == [{"n": 2, "top": 5}], "condition of caller on watermark column must be kept"
+
+        rollup = Rollup(client, "events", {"top": "amount__max"}, "id")
+        table.rows[:] = [(1, None)]
+        await rollup.refresh()
+        table.rows.extend([(2, 7), (3, None)])
+        await rollup.refresh()
+
+        assert await rollup.fetch() == [{"top": 7}], "NULL partial values must be skipped in merge"
+
+
+def test_memory_store_unsupported():
+    with pytest.raises(AssertionError):
+        Rollup(None, "events", {"users": "id__uniq"}, "id")
+
+
+@pytest.mark.asyncio
+async def test_table_rollup():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        table = fake.add_table("test.events", columns, make_rows(1, 5))
+        target = fake.add_table(
+            "test.events_rollup",
+            [("country", "String"), ("n", "UInt64"), ("total", "UInt64"), ("_watermark", "UInt64")],
+        )
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+        aggregations = {"n": "count", "total": "amount__sum"}
+
+        rollup = Rollup(client, "events", aggregations, "id", ["country"], store=TableStore("events_rollup"))
+        await rollup.refresh()
+
+        table.rows.extend(make_rows(5, 8))
+        await rollup.refresh()
+
+        insert_query = [query.query for query in fake.queries if query.query.startswith("INSERT")][-1]
+
+        assert insert_query == (
+            "INSERT INTO test.events_rollup (country, n, total, _watermark) SELECT country, countState() AS n, "
+            "sumState(amount) AS total, max(id) AS _watermark FROM test.events WHERE ((id) > 4) and ((id) <= 7) "
+            "GROUP BY country"
+        ), "insert query not eq"
+
+        assert len(target.rows) == 4, "states of each refresh must be inserted"
+
+        rows = by_country(await rollup.fetch())
+
+        assert rows == {
+            "de": {"country": "de", "n": 4, "total": 160},
+            "fr": {"country": "fr", "n": 3, "total": 120},
+        }, "rows must be merged by -Merge functions"
+
+        restored = Rollup(client, "events", aggregations, "id", ["country"], store=TableStore("events_rollup"))
+
+        assert not await restored.refresh(), "watermark must be restored from target table"
@@ -0,0 +1,72 @@
+import pytest
+from aiohttp import ClientSession
+
+from clickhouse_utils.exceptions import InsertError
+from clickhouse_utils.retry import NO_RETRY
+from clickhouse_utils.sharding import ShardedWriter
+from clickhouse_utils.testing import FakeClickHouse
+
+
+columns = [("id", "UInt64"), ("name", "String")]
+
+
+def test_split():
+    writer = ShardedWriter([None, None, None], sharding_key=lambda row: row[0], weights=[1, 2, 1])
+
+    shards = writer.split([(i,) for i in range(8)])
+
+    check_shards = {
+        0: [(0,), (4,)],
+        1: [(1,), (2,), (5,), (6,)],
+        2: [(3,), (7,)],
+    }
+
+    assert shards == check_shards, "rows must be split by weights like Distributed table"
+
+
+def test_split_without_key():
+    writer = ShardedWriter([None, None])
+
+    assert writer.split([(i,) for i in range(4)]) == {0: [(0,), (2,)], 1: [(1,), (3,)]}, "rows must be split evenly"
+
+
+@pytest.mark.asyncio
+async def test_sharded_create():
+    async with FakeClickHouse() as shard_1, FakeClickHouse() as shard_2, ClientSession() as session:
+        table_1 = shard_1.add_table("test.events_local", columns)
+        table_2 = shard_2.add_table("test.events_local", columns)
+
+        writer = ShardedWriter.init_writer(
+            session, [shard_1.url, shard_2.url], "debug", "debug", "test", sharding_key=lambda row: row[0]
+        )
+        values = [(i, f"name {i}") for i in range(10)]
+
+        results = await writer.create("events_local", values)
+
+        assert table_1.rows == values[0::2], "rows of first shard not eq"
+
+        assert table_2.rows == values[1::2], "rows of second shard not eq"
+
+        assert sorted(results) == [0, 1], "must be results of both shards"
+
+
+@pytest.mark.asyncio
+async def test_sharded_create_error():
+    async with FakeClickHouse() as shard_1, FakeClickHouse() as shard_2, ClientSession() as session:
+        table_1 = shard_1.add_table("test.events_local", columns)
+        shard_2.add_table("test.events_local", columns)
+        shard_2.fail_next()
+
+        writer = ShardedWriter.init_writer(
+            session, [shard_1.url, shard_2.url], "debug", "debug", "test", sharding_key=lambda row: row[0]
+        )
+        values = [(i, f"name {i}") for i in range(4)]
+
+        with pytest.raises(InsertError) as error:
+            await writer.create("events_local", values, retry_policy=NO_RETRY)
+
+        results = error.value.results
+
+        assert results[0][0].ok and table_1.rows == values[0::2], "first shard must be committed"
+
+        assert isinstance(results[1], InsertError), "error of second shard must be in results"
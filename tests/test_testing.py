@@ -0,0 +1,79 @@
+import pytest
+
+from aiohttp import ClientSession
+from clickhouse_utils.client import ChExecutorClient
+from clickhouse_utils.retry import RetryPolicy
+from clickhouse_utils.testing import FakeClickHouse
+from aiochclient.exceptions import ChClientError
+
+
+columns = [("id", "UInt64"), ("name", "String"), ("tags", "Array(String)")]
+
+
+@pytest.mark.asyncio
+async def test_fake_insert_select():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        table = fake.add_table("test.table", columns)
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        values = [(1, "it's", ["a"]), (2, "tab\there", []), (3, "c", ["b", "c"])]
+        await client.create("table", values)
+
+        assert table.rows == values, "rows in fake table not eq inserted"
+
+        rows = await client.get_list("table", filter_params={"id__gte": 2}, ordering=["-id"])
+
+        assert [row[:] for row in rows] == values[:0:-1], "selected rows not eq"
+
+        count = await client.get_count(table="table", filter_params={"name": "c"})
+
+        assert count == 1, "count not eq"
+
+
+@pytest.mark.asyncio
+async def test_fake_deduplication_and_errors():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        table = fake.add_table("test.table", columns)
+        client = ChExecutorClient.init_client(
+            session,
+            fake.url,
+            "debug",
+            "debug",
+            "test",
+            retry_policy=RetryPolicy(base_delay=0.01, retry_on=(ChClientError,)),
+        )
+        values = [(1, "a", [])]
+
+        fake.fail_next()
+        results = await client.create("table", values)
+        await client.create("table", values)
+
+        assert results[0].attempts == 2, "failed block must be retried"
+
+        assert table.rows == values, "replayed block must be deduplicated"
+
+        assert fake.queries[0].status == 500, "first query must be failed"
+
+
+@pytest.mark.asyncio
+async def test_fake_response_streaming():
+    async with FakeClickHouse(chunk_size=16) as fake, ClientSession() as session:
+        fake.add_response(r"FROM system\.numbers", [("number", "UInt64")], [(i,) for i in range(100)])
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        rows = await client.raw("SELECT number FROM system.numbers LIMIT 100")
+
+        assert [row[0] for row in rows] == list(range(100)), "streamed rows not eq"
+
+
+@pytest.mark.asyncio
+async def test_fake_response_order():
+    async with FakeClickHouse() as fake, ClientSession() as session:
+        fake.add_response(r"^SELECT count\(\) FROM", [("c", "UInt64")], [(100,)])
+        fake.add_response(r"FROM test\.table", [("id", "UInt64")], [(1,)])
+        fake.add_response(r"FROM test\.table", [("id", "UInt64")], [(2,)])
+        client = ChExecutorClient.init_client(session, fake.url, "debug", "debug", "test")
+
+        assert await client.get_count(table="table") == 100, "patterns must be checked in order of addition"
+
+        assert (await client.get_object("table"))["id"] == 2, "response for the same pattern must be replaced"